@@ -1,13 +1,19 @@
 import os
-import psycopg2
-from fastapi import FastAPI, Request
+import sys
+import threading
+from fastapi import Body, FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ConnectionPool
+from retention import RetentionWorker
+
 env_path = Path(__file__).resolve().parent.parent / "configuration" / ".env"
 load_dotenv(dotenv_path=env_path)
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -18,7 +24,15 @@ if not DATABASE_URL:
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index builds on a large table take a while; serve requests meanwhile
+    threading.Thread(target=create_log_indexes, name="log-indexes", daemon=True).start()
+    retention_worker.start()
+    yield
+    retention_worker.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,34 +44,95 @@ app.add_middleware(
 
 app.mount("/admin/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
-conn = psycopg2.connect(DATABASE_URL)
-cursor = conn.cursor()
+# Handlers are plain functions so FastAPI runs them in its thread pool,
+# each borrowing a pooled connection instead of sharing one global cursor
+db_pool = ConnectionPool(DATABASE_URL)
 
 # Ensure admin_settings table exists
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS admin_settings (
-    key TEXT PRIMARY KEY,
-    value TEXT NOT NULL
-)
-""")
-conn.commit()
+with db_pool.cursor() as cursor:
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS admin_settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """)
+
+# Old chat logs are purged in the background, not on the request path
+retention_worker = RetentionWorker(db_pool)
+
+# Rows per /logs page
+LOGS_PAGE_SIZE = int(os.getenv("ADMIN_LOGS_PAGE_SIZE", 50))
+LOGS_MAX_PAGE_SIZE = 500
+
+# Full-text search document for /logs?q=; must match the GIN index expression
+LOG_SEARCH_VECTOR = "to_tsvector('simple', coalesce(user_message, '') || ' ' || coalesce(ai_response, ''))"
+
+# Pages are read in (timestamp, id) order, so these serve the session and
+# time filters without sorting; id breaks ties between equal timestamps
+LOG_INDEXES = {
+    "chat_logs_session_timestamp_id_idx": "ON chat_logs (session_id, timestamp, id)",
+    "chat_logs_timestamp_id_idx": "ON chat_logs (timestamp, id)",
+    "chat_logs_search_idx": f"ON chat_logs USING gin ({LOG_SEARCH_VECTOR})",
+}
+
+def create_log_indexes():
+    """Build missing chat_logs indexes without blocking the chatbots' inserts."""
+    with db_pool.autocommit_cursor() as cursor:
+        # chat_logs is created by the chatbot service
+        cursor.execute("SELECT to_regclass('chat_logs')")
+        if not cursor.fetchone()[0]:
+            print("chat_logs does not exist yet; its indexes are created on the next start")
+            return
+        for name, definition in LOG_INDEXES.items():
+            cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+            existing = cursor.fetchone()
+            if existing and existing[0]:
+                continue
+            if existing:
+                # Left invalid by an interrupted concurrent build
+                cursor.execute(f"DROP INDEX CONCURRENTLY {name}")
+            print(f"Building index {name}...")
+            cursor.execute(f"CREATE INDEX CONCURRENTLY {name} {definition}")
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    ready = db_pool.check()
+    return JSONResponse(content={"ready": ready}, status_code=200 if ready else 503)
 
 @app.get("/logs")
-async def get_logs(request: Request):
-    session_id = request.query_params.get("session_id")
-    start_time = request.query_params.get("start_time")
-    end_time = request.query_params.get("end_time")
-
-    # Get retention policy from DB
-    cursor.execute("SELECT value FROM admin_settings WHERE key = 'retention_days'")
-    result = cursor.fetchone()
-    if result:
-        days = int(result[0])
-        threshold = datetime.now() - timedelta(days=days)
-        cursor.execute("DELETE FROM chat_logs WHERE timestamp < %s", (threshold,))
-        conn.commit()
-
-    query = "SELECT id, session_id, user_message, ai_response, timestamp FROM chat_logs"
+def get_logs(request: Request):
+    """One page of chat logs, newest first.
+
+    Pages are keyed on (timestamp, id) rather than OFFSET: pass the previous
+    page's next_before_time and next_before_id as before_time and before_id
+    to continue. `q` searches both messages.
+    """
+    params = request.query_params
+    session_id = params.get("session_id")
+    start_time = params.get("start_time")
+    end_time = params.get("end_time")
+    search = params.get("q", "").strip()
+    try:
+        before_id = int(params["before_id"]) if params.get("before_id") else None
+        before_time = datetime.fromisoformat(params["before_time"]) if params.get("before_time") else None
+        limit = min(max(int(params.get("limit", LOGS_PAGE_SIZE)), 1), LOGS_MAX_PAGE_SIZE)
+    except ValueError:
+        return JSONResponse(
+            content={"error": "before_id and limit must be integers, before_time an ISO timestamp"},
+            status_code=400
+        )
+    if (before_id is None) != (before_time is None):
+        return JSONResponse(content={"error": "before_time and before_id go together"}, status_code=400)
+
+    # Timestamps are formatted by Postgres, as M/D/YYYY, H:MM:SS AM
+    query = (
+        "SELECT id, session_id, user_message, ai_response, "
+        "to_char(timestamp, 'FMMM/FMDD/YYYY, FMHH12:MI:SS AM'), timestamp FROM chat_logs"
+    )
     values = []
     conditions = []
 
@@ -70,55 +145,74 @@ async def get_logs(request: Request):
     if end_time:
         conditions.append("timestamp <= %s")
         values.append(end_time)
+    if search:
+        conditions.append(f"{LOG_SEARCH_VECTOR} @@ plainto_tsquery('simple', %s)")
+        values.append(search)
+    if before_id is not None:
+        conditions.append("(timestamp, id) < (%s, %s)")
+        values.extend([before_time, before_id])
 
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
-    query += " ORDER BY timestamp DESC"
+    # Newest first; one extra row tells whether another page exists
+    query += " ORDER BY timestamp DESC, id DESC LIMIT %s"
+    values.append(limit + 1)
 
-    cursor.execute(query, values)
-    rows = cursor.fetchall()
+    with db_pool.cursor() as cursor:
+        cursor.execute(query, values)
+        rows = cursor.fetchall()
 
     logs = [{
         "id": row[0],
         "session_id": row[1],
         "user_message": row[2],
         "ai_response": row[3],
-        "timestamp": row[4].strftime("%-m/%-d/%Y, %-I:%M:%S %p")
-    } for row in rows]
+        "timestamp": row[4]
+    } for row in rows[:limit]]
 
-    return JSONResponse(content=logs)
+    next_before_time = next_before_id = None
+    if len(rows) > limit:
+        next_before_time, next_before_id = rows[limit - 1][5].isoformat(), rows[limit - 1][0]
+    return JSONResponse(content={
+        "logs": logs, "next_before_time": next_before_time, "next_before_id": next_before_id
+    })
 
 @app.post("/delete")
-async def delete_logs(request: Request):
-    data = await request.json()
+def delete_logs(data: dict = Body(...)):
     ids = data.get("ids", [])
 
     try:
         ids = list(map(int, ids))  # convert to integer for SQL match
-        cursor.execute("DELETE FROM chat_logs WHERE id = ANY(%s)", (ids,))
-        conn.commit()
+        with db_pool.cursor() as cursor:
+            cursor.execute("DELETE FROM chat_logs WHERE id = ANY(%s)", (ids,))
         return JSONResponse(content={"message": "Deleted successfully."})
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.get("/retention")
-async def get_retention():
-    cursor.execute("SELECT value FROM admin_settings WHERE key = 'retention_days'")
-    result = cursor.fetchone()
+def get_retention():
+    with db_pool.cursor() as cursor:
+        cursor.execute("SELECT value FROM admin_settings WHERE key = 'retention_days'")
+        result = cursor.fetchone()
     return {"days": int(result[0]) if result else 30}
 
 @app.post("/retention")
-async def update_retention(request: Request):
-    data = await request.json()
+def update_retention(data: dict = Body(...)):
     days = data.get("days", 30)
-    cursor.execute("""
-        INSERT INTO admin_settings (key, value)
-        VALUES ('retention_days', %s)
-        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
-    """, (str(days),))
-    conn.commit()
+    with db_pool.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO admin_settings (key, value)
+            VALUES ('retention_days', %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+        """, (str(days),))
+    # Apply a shorter retention now rather than at the next scheduled run
+    retention_worker.run_now()
     return {"message": f"Retention updated to {days} days."}
 
+@app.get("/retention/stats")
+def retention_stats():
+    return retention_worker.stats
+
 if __name__ == "__main__":
     import uvicorn
     import os
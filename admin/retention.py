@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import traceback
+
+# How often the purge runs, how many rows each delete removes, and the
+# pause between deletes that lets chat logging and the dashboard in
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", 3600))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 5000))
+RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", 0.1))
+
+# Each batch is its own short transaction; rows locked by a concurrent
+# delete from the dashboard are skipped rather than waited for
+PURGE_SQL = """
+    DELETE FROM chat_logs WHERE id IN (
+        SELECT id FROM chat_logs
+        WHERE timestamp < %s
+        ORDER BY timestamp
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+class RetentionWorker:
+    """Deletes chat_logs older than admin_settings.retention_days.
+
+    Runs in a background thread every `interval` seconds (or when woken
+    by `run_now`), deleting at most `batch_size` rows per transaction so
+    no request waits on a large delete and locks are held briefly.
+    """
+
+    def __init__(self, db_pool, interval=RETENTION_INTERVAL_SECONDS,
+                 batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_BATCH_PAUSE_SECONDS):
+        self.db_pool = db_pool
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "running": False,
+            "retention_days": None,
+            "runs": 0,
+            "last_started": None,
+            "last_seconds": None,
+            "last_deleted": 0,
+            "total_deleted": 0,
+            "last_error": None,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_now(self):
+        """Start a purge without waiting for the next interval."""
+        self._wake.set()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.purge()
+            except Exception as e:
+                traceback.print_exc()
+                self._update(running=False, last_error=str(e))
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def purge(self) -> int:
+        """Delete expired rows batch by batch; returns how many were deleted."""
+        with self.db_pool.cursor() as cursor:
+            cursor.execute("SELECT value FROM admin_settings WHERE key = 'retention_days'")
+            result = cursor.fetchone()
+            if not result:
+                self._update(retention_days=None)
+                return 0
+            days = int(result[0])
+            # Same clock as the column's CURRENT_TIMESTAMP default
+            cursor.execute("SELECT LOCALTIMESTAMP - %s * INTERVAL '1 day'", (days,))
+            threshold = cursor.fetchone()[0]
+
+        started = time.time()
+        self._update(running=True, retention_days=days, last_started=started, last_error=None)
+        deleted = 0
+        while not self._stop.is_set():
+            with self.db_pool.cursor() as cursor:
+                cursor.execute(PURGE_SQL, (threshold, self.batch_size))
+                count = cursor.rowcount
+            deleted += count
+            if count < self.batch_size:
+                break
+            time.sleep(self.pause)
+
+        with self._lock:
+            self._stats.update(running=False, last_seconds=round(time.time() - started, 3), last_deleted=deleted)
+            self._stats["runs"] += 1
+            self._stats["total_deleted"] += deleted
+        if deleted:
+            print(f"Retention purge deleted {deleted} chat logs older than {days} days")
+        return deleted
+
+    def _update(self, **fields):
+        with self._lock:
+            self._stats.update(fields)
@@ -1,21 +1,47 @@
+// Filters of the current listing and the cursor of its next page
+let currentFilters = {};
+let nextBefore = null;
+let loadingLogs = false;
+// Bumped by every reset, so responses for an older listing are dropped
+let listing = 0;
+
 async function fetchLogs(params = {}) {
-  const query = new URLSearchParams(params).toString();
-  const res = await fetch(`/logs?${query}`);
-  const logs = await res.json();
-
-  const table = document.getElementById("log-table");
-  table.innerHTML = "";
-  logs.forEach(log => {
-      const row = document.createElement("tr");
-      row.innerHTML = `
-          <td><input type="checkbox" value="${log.id}"></td>
-          <td>${log.timestamp}</td>
-          <td>${log.session_id}</td>
-          <td>${log.user_message}</td>
-          <td>${log.ai_response}</td>
-      `;
-      table.appendChild(row);
-  });
+  listing++;
+  currentFilters = params;
+  nextBefore = null;
+  loadingLogs = false;
+  document.getElementById("log-table").innerHTML = "";
+  await loadMoreLogs(true);
+}
+
+async function loadMoreLogs(first = false) {
+  if (loadingLogs || (!first && nextBefore === null)) return;
+  const current = listing;
+  loadingLogs = true;
+  try {
+      const params = { ...currentFilters, ...(nextBefore || {}) };
+      const query = new URLSearchParams(params).toString();
+      const res = await fetch(`/logs?${query}`);
+      const { logs, next_before_time, next_before_id } = await res.json();
+      if (current !== listing) return;
+      nextBefore = next_before_id === null ? null : { before_time: next_before_time, before_id: next_before_id };
+
+      const table = document.getElementById("log-table");
+      logs.forEach(log => {
+          const row = document.createElement("tr");
+          row.innerHTML = `
+              <td><input type="checkbox" value="${log.id}"></td>
+              <td>${log.timestamp}</td>
+              <td>${log.session_id}</td>
+              <td>${log.user_message}</td>
+              <td>${log.ai_response}</td>
+          `;
+          table.appendChild(row);
+      });
+      document.getElementById("log-end").textContent = nextBefore === null ? "No more logs." : "";
+  } finally {
+      if (current === listing) loadingLogs = false;
+  }
 }
 
 function searchBySession() {
@@ -34,6 +60,16 @@ function searchByTime() {
   fetchLogs({ start_time: from, end_time: to });
 }
 
+function searchMessages() {
+  const text = document.getElementById("search-text").value.trim();
+  fetchLogs({ q: text });
+}
+
+function resetSearch() {
+  document.getElementById("search-text").value = "";
+  fetchLogs();
+}
+
 function resetTime() {
   document.getElementById("start-time").value = "";
   document.getElementById("end-time").value = "";
@@ -87,6 +123,10 @@ async function loadRetention() {
 }
 
 window.onload = () => {
+  // Load the next page when the end of the table scrolls into view
+  new IntersectionObserver(entries => {
+      if (entries[0].isIntersecting) loadMoreLogs();
+  }).observe(document.getElementById("log-end"));
   fetchLogs();
   loadRetention();
 };
@@ -1,24 +1,27 @@
 import os
 import gc
 import uuid
-import torch
-import asyncio
-import re
+import sys
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from starlette.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import create_generator
+
 # Initialize FastAPI app
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("App starting up...")
+    # Load the model in the background; /readyz reports when it is done
+    await generator.start(wait=False)
     yield
     print("App shutting down...")
+    await generator.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -34,65 +37,46 @@ app.add_middleware(
 # Serve static UI if needed
 app.mount("/chatbot/static", StaticFiles(directory="static"), name="static")
 
-# Load model and tokenizer
-MODEL_NAME = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    torch_dtype=torch.float16,
-    device_map=None
+# Shared model service: loads the model in-process, or talks to
+# `python -m inference.server` when INFERENCE_URL is set
+generator = create_generator()
+PROFILE = "chat"
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant. Answer the user's question concisely and accurately. "
+    "Do not explain your reasoning or thought process. Just provide the answer."
 )
 
-device = torch.device("cpu")
-model.to(device)
+# Every session starts with the system prompt, so its key/values are computed once
+generator.register_prefix(f"System: {SYSTEM_PROMPT}")
 
-# Locks and chat state
+# Chat state
 chat_histories = {}
 MAX_HISTORY = 3
-model_lock = asyncio.Lock()
-
-# Clean up AI output
-def clean_response(raw: str) -> str:
-    response = raw.split("Assistant:")[-1].strip()
-
-    # Remove XML-style tags like </think>
-    response = re.sub(r"<.*?>", "", response)
-
-    # Remove hallucinated dialog continuation
-    response = re.split(r"\b(User:|Assistant:)\b", response)[0].strip()
-
-    # Remove filler/thinking phrases
-    response = re.sub(
-        r'(?i)\b(Hmm|Wait|Let me think|I think|Maybe|Possibly|Alternatively|Should I|Now I need to|So|Alright|Anyway)\b.*',
-        '',
-        response
-    ).strip()
 
-    # Keep only the first 1-2 sentences
-    sentences = re.split(r'(?<=[.!?]) +', response)
-    response = " ".join(sentences[:2]).strip()
-
-    if not response.endswith(('.', '!', '?')):
-        response += '.'
-
-    return response
+# Push answer fragments to the socket as tokens arrive instead of one blob
+STREAM_RESPONSES = True
 
 # Generate model response
-def generate_response(context: str) -> str:
-    inputs = tokenizer(context, return_tensors="pt").to(device)
-    outputs = model.generate(
-        **inputs,
-        max_new_tokens=256,
-        do_sample=True,
-        temperature=0.7,
-        top_p=0.9,
-        repetition_penalty=1.2,
-        pad_token_id=tokenizer.eos_token_id
-    )
-    decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    del inputs, outputs
-    gc.collect()
-    return clean_response(decoded)
+async def generate_response(context: str, session_id: str) -> str:
+    return await generator.generate(context, PROFILE, session_id)
+
+# Stream model response to the socket as it is generated
+async def stream_response(websocket: WebSocket, context: str, session_id: str) -> str:
+    fragments = []
+    async for fragment in generator.stream(context, PROFILE, session_id):
+        fragments.append(fragment)
+        await websocket.send_text(fragment)
+    return "".join(fragments)
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    status = await generator.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
 
 # WebSocket chat endpoint
 @app.websocket("/chat")
@@ -101,11 +85,7 @@ async def websocket_endpoint(websocket: WebSocket):
     session_id = str(uuid.uuid4())
     print(f"[{session_id}] Connected at {datetime.now().isoformat()}")
 
-    system_prompt = (
-        "You are a helpful AI assistant. Answer the user's question concisely and accurately. "
-        "Do not explain your reasoning or thought process. Just provide the answer."
-    )
-    chat_histories[session_id] = [f"System: {system_prompt}"]
+    chat_histories[session_id] = [f"System: {SYSTEM_PROMPT}"]
 
     try:
         while True:
@@ -118,25 +98,28 @@ async def websocket_endpoint(websocket: WebSocket):
 
             context = "\n".join(chat_histories[session_id]) + "\nAssistant:"
 
-            async with model_lock:
-                response = await run_in_threadpool(generate_response, context)
+            if STREAM_RESPONSES:
+                response = await stream_response(websocket, context, session_id)
+            else:
+                response = await generate_response(context, session_id)
+                await websocket.send_text(response)
+            await websocket.send_text("[END]")
 
             chat_histories[session_id].append(f"Assistant: {response}")
             print(f"[{session_id}] Assistant: {response}")
 
-            await websocket.send_text(response)
-            await websocket.send_text("[END]")
-
             gc.collect()
 
     except WebSocketDisconnect:
         print(f"[{session_id}] Disconnected at {datetime.now().isoformat()}")
         chat_histories.pop(session_id, None)
+        await generator.release_session(session_id)
         gc.collect()
     except Exception as e:
         print(f"[{session_id}] WebSocket error: {e}")
         await websocket.close()
         chat_histories.pop(session_id, None)
+        await generator.release_session(session_id)
         gc.collect()
 
 if __name__ == "__main__":
@@ -1,21 +1,21 @@
 import os
 import gc
 import uuid
-import torch
-import asyncio
-import databases
-import re
+import sys
 from datetime import datetime
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from starlette.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 import logging
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ChatLogWriter, check_database, create_database
+from inference import create_generator
+
 logging.getLogger("transformers").setLevel(logging.ERROR)
 
 # Load environment variables
@@ -27,7 +27,11 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in .env file")
 
-database = databases.Database(DATABASE_URL)
+# Async connection pool, sized by DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+database = create_database(DATABASE_URL)
+
+# Chat turns are queued and inserted in batches off the response path
+log_writer = ChatLogWriter(database)
 
 CREATE_TABLE_QUERY = """
 CREATE TABLE IF NOT EXISTS chat_logs (
@@ -44,8 +48,13 @@ async def lifespan(app: FastAPI):
     print("App starting up...")
     await database.connect()
     await database.execute(CREATE_TABLE_QUERY)
+    log_writer.start()
+    # Load the model in the background; /readyz reports when it is done
+    await generator.start(wait=False)
     yield
     print("App shutting down...")
+    await generator.stop()
+    await log_writer.stop()
     await database.disconnect()
 
 app = FastAPI(lifespan=lifespan)
@@ -62,88 +71,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model
-MODEL_NAME = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    torch_dtype=torch.float16,
-    device_map=None
+# Shared model service: loads the model in-process, or talks to
+# `python -m inference.server` when INFERENCE_URL is set
+generator = create_generator()
+PROFILE = "chat_db"
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant. Answer the user's question concisely and accurately. "
+    "Do not explain your reasoning or thought process. Just provide the answer in 1-3 complete sentences\n\n"
 )
-device = torch.device("cpu")
-model.to(device)
+
+# Every session starts with the system prompt, so its key/values are computed once
+generator.register_prefix(f"System: {SYSTEM_PROMPT}")
 
 chat_histories = {}
 MAX_HISTORY = 3
-model_lock = torch.Lock() if hasattr(torch, "Lock") else asyncio.Lock()
 
 async def log_chat(session_id: str, user_message: str, ai_response: str):
-    await database.execute(
-        """
-        INSERT INTO chat_logs (session_id, user_message, ai_response)
-        VALUES (:session_id, :user_message, :ai_response)
-        """,
-        {
-            "session_id": session_id,
-            "user_message": user_message,
-            "ai_response": ai_response,
-        }
-    )
+    await log_writer.write(session_id=session_id, user_message=user_message, ai_response=ai_response)
+
+# Push answer fragments to the socket as tokens arrive instead of one blob
+STREAM_RESPONSES = True
 
 # Enhanced response generator
-def generate_response(context: str) -> str:
-    inputs = tokenizer(context, return_tensors="pt").to(device)
-    outputs = model.generate(
-        **inputs,
-        max_new_tokens=100,
-        do_sample=True,
-        temperature=0.5,
-        top_p=0.8,
-        repetition_penalty=1.4,
-        pad_token_id=tokenizer.eos_token_id
-    )
-    decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-    # Extract clean assistant reply
-    response = decoded.split("Assistant:")[-1].strip()
-
-    # Remove tags
-    response = re.sub(r"<.*?>", "", response)
-    
-    # Cut off anything after the next user message or hallucination
-    response = re.split(r"\b(User:|Assistant:)\b", response)[0].strip()
-
-    # Remove 'thinking out loud' patterns
-    response = re.sub(
-        r'(?i)\b(Hmm|Wait|Let me think|I think|Maybe|Possibly|Alternatively|Should I|Now I need to|So|Alright|Anyway)\b.*',
-        '',
-        response
-    ).strip()
-
-
-    # Truncate to max three short sentences
-    sentences = re.split(r'(?<=[.!?]) +', response)
-    response = " ".join(sentences[:3]).strip()
-
-    if not response.endswith(('.', '!', '?')):
-        response += '.'
-
-    # Final cleanup
-    response = response.replace('\n', ' ').strip()
-    return response
+async def generate_response(context: str, session_id: str) -> str:
+    return await generator.generate(context, PROFILE, session_id)
+
+# Stream model response to the socket as it is generated
+async def stream_response(websocket: WebSocket, context: str, session_id: str) -> str:
+    fragments = []
+    async for fragment in generator.stream(context, PROFILE, session_id):
+        fragments.append(fragment)
+        await websocket.send_text(fragment)
+    return "".join(fragments)
 
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    status = await generator.status()
+    status["database"] = await check_database(database)
+    ready = status["ready"] and status["database"]
+    return JSONResponse(content=status, status_code=200 if ready else 503)
+
 @app.websocket("/chat")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     session_id = str(uuid.uuid4())
     print(f"[{session_id}] Connected at {datetime.now().isoformat()}")
 
-    system_prompt = (
-        "You are a helpful AI assistant. Answer the user's question concisely and accurately. "
-        "Do not explain your reasoning or thought process. Just provide the answer in 1-3 complete sentences\n\n"
-    )
-    chat_histories[session_id] = [f"System: {system_prompt}"]
+    chat_histories[session_id] = [f"System: {SYSTEM_PROMPT}"]
 
     try:
         while True:
@@ -156,26 +136,29 @@ async def websocket_endpoint(websocket: WebSocket):
 
             context = "\n".join(chat_histories[session_id]) + "\nAssistant:"
 
-            async with model_lock:
-                response = await run_in_threadpool(generate_response, context)
+            if STREAM_RESPONSES:
+                response = await stream_response(websocket, context, session_id)
+            else:
+                response = await generate_response(context, session_id)
+                await websocket.send_text(response)
+            await websocket.send_text("[END]")
 
             chat_histories[session_id].append(f"Assistant: {response}")
             await log_chat(session_id, user_input, response)
             print(f"[{session_id}] Assistant: {response}")  # 🧾 Added logging here
 
-            await websocket.send_text(response)
-            await websocket.send_text("[END]")
-
             gc.collect()
 
     except WebSocketDisconnect:
         print(f"[{session_id}] Disconnected at {datetime.now().isoformat()}")
         chat_histories.pop(session_id, None)
+        await generator.release_session(session_id)
         gc.collect()
     except Exception as e:
         print(f"[{session_id}] WebSocket error: {e}")
         await websocket.close()
         chat_histories.pop(session_id, None)
+        await generator.release_session(session_id)
         gc.collect()
 
 if __name__ == "__main__":
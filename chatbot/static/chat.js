@@ -15,15 +15,23 @@ function sendMessage() {
     }
 }
 
-ws.onmessage = (event) => {
-    const message = event.data.trim();
+// The reply currently being streamed in, closed by the [END] sentinel
+let currentReply = null;
 
-    if (message === "[END]") {
-        // Optionally hide loading spinner or do nothing
+ws.onmessage = (event) => {
+    if (event.data.trim() === "[END]") {
+        currentReply = null;
         return;
     }
 
-    displayMessage(message, "ai");
+    if (!currentReply) {
+        currentReply = displayMessage("", "ai");
+    }
+    currentReply.text += event.data;
+    currentReply.div.innerText = "AI: " + currentReply.text.trim();
+
+    const chatBox = document.getElementById("chat-box");
+    chatBox.scrollTop = chatBox.scrollHeight;
 };
 
 function displayMessage(text, sender) {
@@ -35,6 +43,7 @@ function displayMessage(text, sender) {
     
     chatBox.appendChild(messageDiv);
     chatBox.scrollTop = chatBox.scrollHeight;
+    return { div: messageDiv, text };
 }
 
 function handleKey(event) {
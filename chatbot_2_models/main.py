@@ -1,19 +1,25 @@
 import os
 import uuid
 import numpy as np
-import psycopg2
 import torch
+import sys
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
+from pathlib import Path
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from psycopg2.extensions import register_adapter, AsIs
+from fastapi.responses import FileResponse, JSONResponse
 import warnings
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ChatLogWriter, check_database, create_database, database_url
+from embedding import EmbeddingBatcher, get_encoder
+from inference import create_generator
+from retrieval import MemoryIndex, answer_from_chunk, register_vector, search_chunks_async
+from response_cache import ResponseCache
+
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
@@ -29,112 +35,205 @@ DB_CONFIG = {
     'host': 'localhost',
     'port': 5432
 }
+# Async pool, so lookups and logging never block the event loop; vectors go over the wire in binary
+database = create_database(database_url(DB_CONFIG), init=register_vector)
+
+# Conversations are queued and inserted in batches off the response path
+log_writer = ChatLogWriter(database, columns=("session_id", "user_message", "ai_response", "source"))
+
+# ML models are loaded in the background once the server is up, see lifespan
+embedding_model = None
+embedding_batcher = None
+embedding_status = {"state": "pending", "error": None}
+embedding_ready = asyncio.Event()
+
+# DeepSeek LLM, loaded at startup or served by `python -m inference.server` when INFERENCE_URL is set
+generator = create_generator(device="cuda" if torch.cuda.is_available() else "cpu")
+
+async def load_embedding_model():
+    global embedding_model, embedding_batcher
+    logger.info("Loading sentence transformer...")
+    embedding_status["state"] = "loading"
+    try:
+        embedding_model = await asyncio.to_thread(get_encoder)
+        # Questions arriving together are encoded as one batch
+        embedding_batcher = EmbeddingBatcher(embedding_model)
+        embedding_batcher.start()
+        embedding_status["state"] = "ready"
+        logger.info("Sentence transformer loaded")
+    except Exception as e:
+        logger.error(f"Failed to load sentence transformer: {e}")
+        embedding_status.update(state="failed", error=str(e))
+    finally:
+        # Wakes waiting connections whether loading worked or not
+        embedding_ready.set()
 
-# Initialize ML models
-logger.info("Loading sentence transformer...")
-embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-
-# Initialize DeepSeek LLM
-logger.info("Loading LLM...")
-tokenizer = AutoTokenizer.from_pretrained("deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B")
-model = AutoModelForCausalLM.from_pretrained(
-    "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B",
-    torch_dtype=torch.float16,
-    device_map="auto"
-)
-logger.info("Models loaded successfully")
-
-# Database adapter
-def adapt_numpy_array(arr):
-    return AsIs("'" + "[" + ",".join([str(x) for x in arr.tolist()]) + "]" + "'")
-register_adapter(np.ndarray, adapt_numpy_array)
-
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind the port first and load both models in parallel; /readyz reports progress
+    await database.connect()
+    log_writer.start()
+    logger.info("Loading LLM...")
+    await generator.start(wait=False)
+    loader = asyncio.create_task(load_embedding_model())
+    watcher = asyncio.create_task(watch_training_materials())
+    yield
+    loader.cancel()
+    watcher.cancel()
+    if embedding_batcher is not None:
+        await embedding_batcher.stop()
+    await generator.stop()
+    await log_writer.stop()
+    await database.disconnect()
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Constants
 SIMILARITY_THRESHOLD = 0.7  # Increased from 0.35 for stricter matching
-model_lock = asyncio.Lock()
+LLM_ERROR_MESSAGE = "I encountered an error processing your request."
+
+# LLM answers for questions the knowledge base could not answer
+ANSWER_CACHE_SIZE = 1000
+ANSWER_CACHE_TTL = 3600  # seconds
+ANSWER_CACHE_SIMILARITY = 0.95  # cosine similarity to reuse an answer for a reworded question
+CACHE_CHECK_SECONDS = 30  # how often to look for changed training materials
+response_cache = ResponseCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY)
+
+# RAG_BACKEND=memory searches a memory-mapped copy of rag_chunks in process
+# (for corpora of a few thousand chunks) instead of querying Postgres
+RAG_BACKEND = os.getenv("RAG_BACKEND", "postgres")
+memory_index = MemoryIndex() if RAG_BACKEND == "memory" else None
+# Set once the in-memory index matches rag_chunks; until then a question
+# would miss RAG and its LLM answer would be cached over the knowledge base
+rag_ready = asyncio.Event()
+if memory_index is None:
+    rag_ready.set()
 
-def get_rag_response(question: str) -> tuple[str, bool]:
+async def embed_question(question: str) -> np.ndarray:
+    """Unit-length embedding of the question, cached for repeated questions"""
+    return await embedding_batcher.embed(question)
+
+async def get_rag_response(question: str, normalized: np.ndarray) -> tuple[str, bool]:
     """Search for similar questions in rag_chunks"""
     try:
         logger.info(f"Searching RAG for: {question}")
-        embedding = embedding_model.encode(question)
-        normalized = embedding / np.linalg.norm(embedding)
-        
-        with psycopg2.connect(**DB_CONFIG) as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT chunk, 1 - (embedding <=> %s) AS similarity
-                    FROM rag_chunks
-                    WHERE 1 - (embedding <=> %s) > %s
-                    ORDER BY similarity DESC
-                    LIMIT 1
-                """, (normalized, normalized, SIMILARITY_THRESHOLD))
+        if memory_index is not None:
+            matches = memory_index.search(normalized, top_k=1)
+        else:
+            matches = await search_chunks_async(database, normalized, top_k=1)
+
+        if matches:
+            chunk, distance = matches[0]
+            similarity = 1 - distance
+            logger.info(f"Found match with similarity: {similarity:.2f}")
+            logger.info(f"Matching chunk: {chunk[:100]}...")  # Log first 100 chars
+            
+            # Additional validation
+            if similarity <= SIMILARITY_THRESHOLD:
+                return ("", False)
                 
-                if result := cur.fetchone():
-                    chunk, similarity = result
-                    logger.info(f"Found match with similarity: {similarity:.2f}")
-                    logger.info(f"Matching chunk: {chunk[:100]}...")  # Log first 100 chars
-                    
-                    # Additional validation
-                    if similarity < SIMILARITY_THRESHOLD:
-                        return ("", False)
-                        
-                    parts = chunk.split(",", 1)
-                    return (parts[1].strip() if len(parts) > 1 else chunk.strip(), True)
+            return (answer_from_chunk(chunk), True)
     except Exception as e:
         logger.error(f"RAG search error: {e}")
     return ("", False)
 
-def generate_llm_response(prompt: str) -> str:
+async def generate_llm_response(prompt: str) -> str:
     """Generate response using local DeepSeek LLM"""
     try:
         logger.info("Generating LLM response...")
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=150,
-            temperature=0.7,
-            top_p=0.9,
-            repetition_penalty=1.1,
-            pad_token_id=tokenizer.eos_token_id
-        )
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Clean response
-        if "Assistant:" in response:
-            response = response.split("Assistant:")[-1].strip()
-        response = response.split("User:")[0].strip()
-        
-        if not response.endswith(('.', '!', '?')):
-            response += '.'
-            
+        response = await generator.generate(prompt, "rag_fallback")
         logger.info(f"LLM response: {response[:100]}...")
-        return response.replace('\n', ' ').strip()
+        return response
     except Exception as e:
         logger.error(f"LLM generation error: {e}")
-        return "I encountered an error processing your request."
+        return LLM_ERROR_MESSAGE
+
+async def get_rag_version():
+    """Fingerprint of rag_chunks that changes whenever embeddings are reprocessed"""
+    row = await database.fetch_one("SELECT count(*), max(id), max(created_at) FROM rag_chunks")
+    return tuple(row.values())
+
+async def watch_training_materials():
+    """Drop cached answers and refresh the in-memory index whenever the training materials change"""
+    version = None
+    if memory_index is not None:
+        await asyncio.to_thread(memory_index.load)
+    while True:
+        try:
+            current = await get_rag_version()
+            if version is not None and current != version:
+                logger.info("Training materials changed, clearing answer cache")
+                response_cache.clear()
+            if memory_index is not None and memory_index.version != str(current):
+                await memory_index.refresh_async(database, str(current))
+            version = current
+            rag_ready.set()
+        except Exception as e:
+            logger.error(f"Answer cache check failed: {e}")
+        await asyncio.sleep(CACHE_CHECK_SECONDS)
+
+async def answer_question(question: str) -> tuple[str, str]:
+    """Return (answer, source) from the knowledge base, the answer cache or the LLM"""
+    # The same question was answered by the LLM recently
+    if (answer := response_cache.get(question)) is not None:
+        logger.info("Answer cache hit")
+        return answer, "LLM"
+
+    # Try RAG first; encoding runs off the event loop, batched with concurrent questions
+    normalized = await embed_question(question)
+    answer, is_rag = await get_rag_response(question, normalized)
+    if is_rag:
+        return answer, "RAG"
+
+    # Then an LLM answer to a reworded question
+    if (answer := response_cache.get_similar(normalized)) is not None:
+        logger.info("Similar question found in answer cache")
+        return answer, "LLM"
+
+    # Fall back to LLM
+    logger.info("Using LLM...")
+    answer = await generate_llm_response(f"User: {question}\nAssistant:")
+    if answer != LLM_ERROR_MESSAGE:
+        response_cache.put(question, answer, normalized)
+    return answer, "LLM"
 
 async def log_conversation(session_id: str, question: str, answer: str, source: str):
-    """Log conversation to database"""
-    try:
-        with psycopg2.connect(**DB_CONFIG) as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO chat_logs (session_id, user_message, ai_response, source)
-                    VALUES (%s, %s, %s, %s)
-                """, (session_id, question, answer, source))
-                conn.commit()
-        logger.info(f"Logged conversation to DB")
-    except Exception as e:
-        logger.error(f"Failed to log conversation: {e}")
+    """Queue the conversation for the batched chat_logs writer"""
+    await log_writer.write(session_id=session_id, user_message=question, ai_response=answer, source=source)
 
 @app.get("/")
 async def home():
     return FileResponse("static/index.html")
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    llm = await generator.status()
+    database_ok = await check_database(database)
+    ready = embedding_status["state"] == "ready" and rag_ready.is_set() and llm["ready"] and database_ok
+    return JSONResponse(
+        content={
+            "ready": ready, "embedding_model": embedding_status, "rag_index": rag_ready.is_set(),
+            "llm": llm, "database": database_ok
+        },
+        status_code=200 if ready else 503
+    )
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "answer_cache": response_cache.stats,
+        "embedding_cache": embedding_model.cache.stats if embedding_model is not None else None,
+        "embedding_batches": embedding_batcher.stats if embedding_batcher is not None else None,
+        "chat_logs": {**log_writer.stats, "pending": log_writer.pending},
+        "rag": {"backend": RAG_BACKEND, "chunks": len(memory_index) if memory_index is not None else None},
+        "llm": await generator.metrics(),
+    }
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -142,19 +241,17 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info(f"New connection: {session_id}")
     
     try:
+        # Questions asked while the models are still loading wait for them
+        await embedding_ready.wait()
+        if embedding_status["state"] != "ready":
+            await websocket.close(code=1011, reason="Embedding model failed to load")
+            return
+        await rag_ready.wait()
         while True:
             question = await websocket.receive_text()
             logger.info(f"Processing: {question}")
             
-            # Try RAG first
-            answer, is_rag = get_rag_response(question)
-            source = "RAG" if is_rag else "LLM"
-            
-            # Fall back to LLM if needed
-            if not is_rag:
-                logger.info("Using LLM...")
-                async with model_lock:
-                    answer = generate_llm_response(f"User: {question}\nAssistant:")
+            answer, source = await answer_question(question)
             
             # Critical: Send as single JSON message
             await websocket.send_json({
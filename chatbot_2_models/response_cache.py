@@ -0,0 +1,85 @@
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(text: str) -> str:
+    """Cache key: lower case, single spaces, no trailing punctuation."""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!. ")
+
+
+class ResponseCache:
+    """LLM answers cached by exact question and by embedding similarity.
+
+    Lookups try the normalized question text first; `get_similar` then
+    compares the question's embedding with the cached ones. Entries expire
+    after `ttl_seconds`, the least recently used go once `max_entries` is
+    reached, and `clear` drops everything when the training materials
+    change.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._matrix_keys = []
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, question: str):
+        key = normalize_question(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        self.stats["exact_hits"] += 1
+        return entry[0]
+
+    def get_similar(self, embedding):
+        """Answer of the most similar cached question, given a unit-length embedding."""
+        self._evict_expired()
+        if not self._entries:
+            self.stats["misses"] += 1
+            return None
+
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key][1] for key in self._matrix_keys])
+        scores = self._matrix @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            self.stats["misses"] += 1
+            return None
+
+        key = self._matrix_keys[best]
+        self._entries.move_to_end(key)
+        self.stats["similar_hits"] += 1
+        return self._entries[key][0]
+
+    def put(self, question: str, answer: str, embedding):
+        key = normalize_question(question)
+        self._entries.pop(key, None)
+        self._entries[key] = (answer, np.asarray(embedding, dtype=np.float32), time.monotonic() + self.ttl_seconds)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def clear(self):
+        self._entries.clear()
+        self._matrix = None
+        self.stats["invalidations"] += 1
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry[2] < now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
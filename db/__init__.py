@@ -0,0 +1,4 @@
+from .log_writer import ChatLogWriter
+from .materials import upsert_materials
+from .pool import ConnectionPool, check_database, create_database, database_url
+from .vector_index import create_vector_index, rebuild_vector_index, search_settings
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT, and how long a partial batch may wait for more rows
+BATCH_SIZE = 100
+FLUSH_MS = 200
+
+# Writers wait once this many rows are queued, so a slow database slows
+# logging down instead of growing memory without bound
+MAX_QUEUE = 10000
+
+_STOP = object()
+
+
+class ChatLogWriter:
+    """Write-behind inserts into chat_logs from async services.
+
+    `write` only queues the row; a background task flushes queued rows as
+    one multi-row INSERT every `batch_size` rows or `flush_ms` milliseconds,
+    whichever comes first. `stop` flushes whatever is still queued, so call
+    it in the lifespan before disconnecting the database.
+    """
+
+    def __init__(self, database, columns=("session_id", "user_message", "ai_response"),
+                 batch_size=BATCH_SIZE, flush_ms=FLUSH_MS, max_queue=MAX_QUEUE, table="chat_logs"):
+        self.database = database
+        self.columns = tuple(columns)
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.table = table
+        self._queue = asyncio.Queue(max_queue)
+        self._task = None
+        self.stats = {"written": 0, "failed": 0, "batches": 0}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def write(self, **row):
+        """Queue one row; waits only while the queue is full."""
+        await self._queue.put(tuple(row[column] for column in self.columns))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_ms / 1000
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        values, params = [], {}
+        for i, row in enumerate(batch):
+            values.append("(" + ", ".join(f":{column}_{i}" for column in self.columns) + ")")
+            params.update({f"{column}_{i}": value for column, value in zip(self.columns, row)})
+        query = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES {', '.join(values)}"
+        try:
+            await self.database.execute(query, params)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Failed to write {len(batch)} chat log rows: {e}")
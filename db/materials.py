@@ -0,0 +1,67 @@
+import csv
+import io
+
+# Staged rows keep their upload order so the last copy of a repeated
+# question wins, as it did when rows were applied one by one
+STAGE_SQL = """
+    CREATE TEMP TABLE materials_upload (
+        ord BIGSERIAL,
+        question TEXT,
+        answer TEXT
+    ) ON COMMIT DROP
+"""
+
+MERGE_SQL = """
+    WITH merged AS (
+        INSERT INTO training_materials (question, answer, updated_at)
+        SELECT DISTINCT ON (question) question, answer, NOW()
+        FROM materials_upload
+        ORDER BY question, ord DESC
+        ON CONFLICT (question) DO UPDATE
+            SET answer = EXCLUDED.answer, updated_at = EXCLUDED.updated_at
+            WHERE training_materials.answer IS DISTINCT FROM EXCLUDED.answer
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+    FROM merged
+"""
+
+
+class _CopyStream:
+    """File-like CSV view of an iterable of rows, pulled lazily by COPY FROM STDIN."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        # Quote everything so empty answers stay '' instead of becoming NULL
+        self._writer = csv.writer(self._buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        self._pending = ""
+
+    def read(self, size=-1):
+        for row in self._rows:
+            self._writer.writerow(row)
+            if size >= 0 and self._buffer.tell() + len(self._pending) >= size:
+                break
+        self._pending += self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def upsert_materials(cur, rows):
+    """Insert or update training_materials from (question, answer) pairs.
+
+    Rows are streamed into a temp table with COPY and merged with one
+    INSERT ... ON CONFLICT, so the cost is a few round trips however long
+    the upload is. Unchanged answers are left alone. Runs in the caller's
+    transaction (psycopg2 cursor) and returns (inserted, updated).
+    """
+    cur.execute(STAGE_SQL)
+    cur.copy_expert("COPY materials_upload (question, answer) FROM STDIN WITH (FORMAT csv)", _CopyStream(rows))
+    cur.execute(MERGE_SQL)
+    inserted, updated = cur.fetchone()
+    cur.execute("DROP TABLE materials_upload")
+    return inserted, updated
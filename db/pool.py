@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Pool sizes shared by every service, overridable per process
+MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+
+# Connections idle for longer than this are pinged before being handed out
+CHECK_AFTER_SECONDS = float(os.getenv("DB_POOL_CHECK_SECONDS", 30))
+
+# How long a caller waits for a free connection once all of them are in use
+ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+
+
+def database_url(params: dict) -> str:
+    """Build a postgresql:// URL from psycopg2-style connection parameters."""
+    return "postgresql://{}:{}@{}:{}/{}".format(
+        quote(params["user"], safe=""), quote(params["password"], safe=""),
+        params.get("host", "localhost"), params.get("port", 5432), params["dbname"],
+    )
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool for Flask and threaded code.
+
+    Connections are opened lazily, between `min_size` and `max_size` of
+    them, and are checked before reuse: closed ones are replaced and those
+    idle for longer than CHECK_AFTER_SECONDS must answer a `SELECT 1`.
+    When all connections are in use callers wait for one to be returned.
+
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(...)
+
+    commits when the block succeeds and rolls back when it raises.
+    """
+
+    def __init__(self, dsn=None, min_size=None, max_size=None, **params):
+        self.dsn = dsn
+        self.params = params
+        self.min_size = MIN_SIZE if min_size is None else min_size
+        self.max_size = MAX_SIZE if max_size is None else max_size
+        self._pool = None
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.min_size, self.max_size, self.dsn, **self.params)
+            return self._pool
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS):
+            raise psycopg2.OperationalError("Timed out waiting for a database connection")
+        try:
+            pool = self._get_pool()
+            for _ in range(self.max_size + 1):
+                conn = pool.getconn()
+                if self._usable(conn):
+                    return conn
+                logger.warning("Discarding broken database connection")
+                self._forget(conn)
+                pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("No usable database connection in the pool")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        broken = conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+        if broken:
+            self._forget(conn)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._get_pool().putconn(conn, close=bool(broken))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    @contextmanager
+    def autocommit_cursor(self):
+        """Cursor outside a transaction, for statements such as CREATE INDEX CONCURRENTLY."""
+        conn = self.getconn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                yield cur
+        finally:
+            if not conn.closed:
+                conn.autocommit = False
+            self.putconn(conn)
+
+    def check(self) -> bool:
+        """Whether the database answers, for readiness probes."""
+        try:
+            with self.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Database health check failed: {e}")
+            return False
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
+
+    def _usable(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < CHECK_AFTER_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _forget(self, conn):
+        self._last_used.pop(id(conn), None)
+
+
+def create_database(url: str, min_size=None, max_size=None, **options):
+    """Async connection pool for FastAPI handlers, sized like ConnectionPool.
+
+    Extra options go to asyncpg's pool, e.g. init=retrieval.register_vector.
+    """
+    import databases
+    return databases.Database(
+        url,
+        min_size=MIN_SIZE if min_size is None else min_size,
+        max_size=MAX_SIZE if max_size is None else max_size,
+        **options,
+    )
+
+
+async def check_database(database) -> bool:
+    """Whether the async pool's database answers, for readiness probes."""
+    try:
+        await database.execute("SELECT 1")
+        return True
+    except Exception as e:
+        logger.error(f"Database health check failed: {e}")
+        return False
@@ -0,0 +1,80 @@
+import os
+
+# Approximate nearest neighbour index on rag_chunks.embedding for cosine
+# distance: "hnsw" (pgvector >= 0.5) or "ivfflat"
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "hnsw")
+INDEX_NAME = "rag_chunks_embedding_idx"
+
+# HNSW graph degree and build-time candidate list; ef_search is the
+# query-time candidate list and trades speed for recall
+HNSW_M = int(os.getenv("RAG_HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", 64))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", 40))
+
+# IVFFlat cluster count (0 derives it from the row count) and the number
+# of clusters probed per query
+IVFFLAT_LISTS = int(os.getenv("RAG_IVFFLAT_LISTS", 0))
+IVFFLAT_PROBES = int(os.getenv("RAG_IVFFLAT_PROBES", 10))
+
+# Index builds are much faster when the graph fits in maintenance memory
+BUILD_MEMORY = os.getenv("RAG_INDEX_BUILD_MEMORY", "256MB")
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's guideline: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if IVFFLAT_LISTS:
+        return IVFFLAT_LISTS
+    return max(1, rows // 1000) if rows <= 1_000_000 else int(rows ** 0.5)
+
+
+def index_sql(rows: int = 0, name: str = INDEX_NAME, concurrently: bool = False) -> str:
+    if INDEX_TYPE == "hnsw":
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif INDEX_TYPE == "ivfflat":
+        options = f"lists = {ivfflat_lists(rows)}"
+    else:
+        raise ValueError(f"Unknown RAG_INDEX_TYPE '{INDEX_TYPE}', expected hnsw or ivfflat")
+    create = "CREATE INDEX CONCURRENTLY" if concurrently else "CREATE INDEX IF NOT EXISTS"
+    return f"{create} {name} ON rag_chunks USING {INDEX_TYPE} (embedding vector_cosine_ops) WITH ({options})"
+
+
+def search_settings() -> list:
+    """SET LOCAL statements to run in a search's transaction before the query."""
+    if INDEX_TYPE == "ivfflat":
+        return [f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}"]
+    return [f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}"]
+
+
+def create_vector_index(cur):
+    """Create the index if it is missing (psycopg2 cursor)."""
+    cur.execute("SELECT count(*) FROM rag_chunks")
+    rows = cur.fetchone()[0]
+    # IVFFlat clusters are trained on the rows present at build time
+    if INDEX_TYPE == "ivfflat" and rows == 0:
+        return
+    cur.execute(f"SET LOCAL maintenance_work_mem = '{BUILD_MEMORY}'")
+    cur.execute(index_sql(rows))
+
+
+def rebuild_vector_index(cur):
+    """Build a fresh index next to the current one and swap it in.
+
+    Needs an autocommit cursor (ConnectionPool.autocommit_cursor): the new
+    index is built CONCURRENTLY, so searches and writes carry on using the
+    old one until it is replaced. Rebuilding after a bulk load retrains
+    IVFFlat clusters and compacts HNSW graphs full of deleted rows.
+    """
+    cur.execute("SELECT count(*) FROM rag_chunks")
+    rows = cur.fetchone()[0]
+    if INDEX_TYPE == "ivfflat" and rows == 0:
+        return
+    new_name = f"{INDEX_NAME}_new"
+    # A build interrupted earlier leaves an invalid index behind
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+    cur.execute(f"SET maintenance_work_mem = '{BUILD_MEMORY}'")
+    try:
+        cur.execute(index_sql(rows, new_name, concurrently=True))
+    finally:
+        cur.execute("RESET maintenance_work_mem")
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+    cur.execute(f"ALTER INDEX {new_name} RENAME TO {INDEX_NAME}")
@@ -0,0 +1,4 @@
+from .backends import BACKENDS, MODEL_NAME, create_backend
+from .batcher import EmbeddingBatcher
+from .cache import EmbeddingCache, normalize_text
+from .encoder import Encoder, get_encoder
@@ -0,0 +1,168 @@
+import argparse
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# "torch" runs SentenceTransformer; "onnx" / "onnx-int8" run an exported
+# (and optionally int8 quantized) copy of the same model on ONNX Runtime
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Exported models are written here once, next to the LLM weight snapshots
+ONNX_DIR = Path(os.getenv("EMBEDDING_ONNX_DIR", Path(__file__).resolve().parent.parent / "models"))
+
+# all-MiniLM-L6-v2 truncates input at 256 tokens
+MAX_SEQ_LENGTH = 256
+
+# Minimum cosine similarity to the PyTorch embeddings an export must reach
+TOLERANCE = {"onnx": 0.9999, "onnx-int8": 0.99}
+
+SAMPLE_TEXTS = [
+    "What are your opening hours?",
+    "How do I reset my password?",
+    "Can I change the delivery address after ordering?",
+    "Which payment methods do you accept",
+    "hello",
+    "Is there a student discount for the annual plan, and how do I apply for it?",
+]
+
+
+class TorchBackend:
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=64) -> np.ndarray:
+        return self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        ).astype(np.float32, copy=False).reshape(len(texts), self.dimension)
+
+
+class OnnxBackend:
+    """Mean-pooled, normalized MiniLM embeddings computed with ONNX Runtime.
+
+    Needs neither torch nor sentence-transformers once the model has been
+    exported (see export_onnx).
+    """
+
+    def __init__(self, model_name, quantized=False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = onnx_path(model_name, quantized)
+        if not path.exists():
+            export_onnx(model_name, quantized)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+        self.tokenizer = Tokenizer.from_pretrained(model_name)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts, batch_size=64) -> np.ndarray:
+        texts = list(texts)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        # Batches of similar length waste less work on padding
+        order = np.argsort([len(text) for text in texts])
+        for start in range(0, len(texts), batch_size):
+            index = order[start:start + batch_size]
+            embeddings[index] = self._encode_batch([texts[i] for i in index])
+        return embeddings
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def create_backend(name=None, model_name=MODEL_NAME):
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {', '.join(BACKENDS)}")
+    if name == "torch":
+        return TorchBackend(model_name)
+    return OnnxBackend(model_name, quantized=name == "onnx-int8")
+
+
+def onnx_path(model_name, quantized=False):
+    suffix = "-int8" if quantized else ""
+    return ONNX_DIR / f"{model_name.replace('/', '--')}{suffix}.onnx"
+
+
+def export_onnx(model_name, quantized=False):
+    """Export the transformer to ONNX (and quantize it), then check it against PyTorch.
+
+    The export is removed again if its embeddings drift further from the
+    PyTorch ones than TOLERANCE allows.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    fp32_path = onnx_path(model_name)
+    fp32_path.parent.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        logger.info(f"Exporting {model_name} to {fp32_path}...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        dummy = tokenizer(SAMPLE_TEXTS[:2], padding=True, return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(dummy[name] for name in names), str(fp32_path),
+                input_names=names, output_names=["last_hidden_state"],
+                dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+                opset_version=14,
+            )
+        _verify_or_remove(model_name, fp32_path, "onnx")
+
+    if quantized:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        path = onnx_path(model_name, quantized=True)
+        logger.info(f"Quantizing {fp32_path} to int8...")
+        quantize_dynamic(str(fp32_path), str(path), weight_type=QuantType.QInt8)
+        _verify_or_remove(model_name, path, "onnx-int8")
+
+
+def compare_backends(backend, reference, texts=SAMPLE_TEXTS) -> float:
+    """Lowest cosine similarity between two backends' embeddings of `texts`."""
+    return float(np.min(np.sum(backend.encode(texts) * reference.encode(texts), axis=1)))
+
+
+def _verify_or_remove(model_name, path, name):
+    similarity = compare_backends(create_backend(name, model_name), TorchBackend(model_name))
+    logger.info(f"{name} export matches PyTorch with cosine similarity >= {similarity:.5f}")
+    if similarity < TOLERANCE[name]:
+        path.unlink()
+        raise RuntimeError(
+            f"{name} embeddings differ from PyTorch (cosine {similarity:.5f} < {TOLERANCE[name]})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the ONNX embedding model and check it against PyTorch")
+    parser.add_argument("--backend", default="onnx-int8", choices=BACKENDS[1:])
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    backend = create_backend(args.backend, args.model)
+    similarity = compare_backends(backend, TorchBackend(args.model))
+    print(f"{args.backend}: min cosine similarity to PyTorch {similarity:.5f} (required {TOLERANCE[args.backend]})")
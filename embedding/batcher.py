@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# A batch is encoded once it has MAX_BATCH queries or its first query has
+# waited MAX_WAIT_MS, whichever comes first
+MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 32))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5))
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into batched encoder calls.
+
+    `embed` answers from the Encoder's cache when it can; otherwise the
+    query joins the next batch, which is encoded in a worker thread while
+    the following batch collects. Identical queries in a batch are encoded
+    once.
+    """
+
+    def __init__(self, encoder, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue = asyncio.Queue()
+        self._task = None
+        self.stats = {"batches": 0, "encoded": 0}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def embed(self, text: str):
+        embedding = self.encoder.cache.get(text)
+        if embedding is not None:
+            return embedding
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._encode(batch)
+
+    async def _encode(self, batch):
+        # Earlier batches may have encoded some of these while they queued;
+        # embed() already counted their cache lookup, so only peek here
+        results = {}
+        for text, _ in batch:
+            if text not in results and (embedding := self.encoder.cache.peek(text)) is not None:
+                results[text] = embedding
+        texts = list(dict.fromkeys(text for text, _ in batch if text not in results))
+
+        if texts:
+            try:
+                embeddings = await asyncio.to_thread(self.encoder.embed, texts, len(texts))
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.stats["batches"] += 1
+            self.stats["encoded"] += len(texts)
+            for text, embedding in zip(texts, embeddings):
+                self.encoder.cache.put(text, embedding)
+                results[text] = embedding
+        for text, future in batch:
+            if not future.done():
+                future.set_result(results[text])
@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Cache key: all-MiniLM-L6-v2 is uncased and ignores repeated whitespace."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """LRU map of normalized query text to its unit-length float32 embedding.
+
+    Cached arrays are read-only because every caller shares them.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, text: str):
+        key = normalize_text(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return embedding
+
+    def peek(self, text: str):
+        """Like get, without counting a hit or miss or refreshing the entry."""
+        with self._lock:
+            return self._entries.get(normalize_text(text))
+
+    def put(self, text: str, embedding):
+        key = normalize_text(text)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
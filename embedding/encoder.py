@@ -0,0 +1,51 @@
+import os
+import threading
+
+import numpy as np
+
+from .backends import MODEL_NAME, create_backend
+from .cache import EmbeddingCache
+
+# Distinct queries remembered per process
+CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+
+
+class Encoder:
+    """all-MiniLM-L6-v2 with an LRU cache in front of query encoding.
+
+    `embed_query` returns unit-length float32 vectors and serves repeated
+    questions from the cache; `embed` encodes a batch of documents without
+    caching. `backend` is one of embedding.backends.BACKENDS and defaults
+    to EMBEDDING_BACKEND.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, cache_size=CACHE_SIZE, backend=None):
+        self.backend = create_backend(backend, model_name)
+        self.cache = EmbeddingCache(cache_size)
+
+    @property
+    def dimension(self) -> int:
+        return self.backend.dimension
+
+    def embed_query(self, text: str) -> np.ndarray:
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = self.embed([text])[0]
+            self.cache.put(text, embedding)
+        return embedding
+
+    def embed(self, texts, batch_size=64) -> np.ndarray:
+        return self.backend.encode(list(texts), batch_size)
+
+
+_encoder = None
+_lock = threading.Lock()
+
+
+def get_encoder() -> Encoder:
+    """The process-wide Encoder, loaded on first use."""
+    global _encoder
+    with _lock:
+        if _encoder is None:
+            _encoder = Encoder()
+        return _encoder
@@ -0,0 +1,4 @@
+from .cleaning import ResponseCleaner
+from .engine import InferenceEngine
+from .generator import PROFILES, Generator, create_generator
+from .loading import load_model
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_nbytes(kv):
+    """Memory held by a tuple of (key, value) pairs per layer."""
+    return sum(key.numel() * key.element_size() + value.numel() * value.element_size() for key, value in kv)
+
+
+def common_prefix_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class SessionCache:
+    """LRU store of each session's past key/values between conversation turns.
+
+    Entries are evicted least recently used first once `max_bytes` is
+    exceeded, after `idle_seconds` without a turn, or explicitly when the
+    session disconnects.
+    """
+
+    def __init__(self, max_bytes, idle_seconds):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def take(self, session_id):
+        """Remove and return (token_ids, kv) for the session, or None."""
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return None
+            token_ids, kv, size, _ = entry
+            self._bytes -= size
+            return token_ids, kv
+
+    def put(self, session_id, token_ids, kv):
+        size = cache_nbytes(kv)
+        with self._lock:
+            self._discard(session_id)
+            if size > self.max_bytes:
+                return
+            self._entries[session_id] = (token_ids, kv, size, time.monotonic())
+            self._bytes += size
+            self._evict_idle()
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def release(self, session_id):
+        with self._lock:
+            self._discard(session_id)
+
+    def _discard(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.idle_seconds
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if entry[3] > deadline:
+                break
+            self._discard(session_id)
+
+
+class PrefixCache:
+    """Precomputed key/values for prompt prefixes shared by many requests.
+
+    Prefixes are looked up by a hash of their token ids, longest first, and
+    their key/values are shared read-only by every sequence that starts with
+    them; decoding appends new states into fresh tensors.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lengths = []
+        self._lock = threading.Lock()
+
+    def register(self, token_ids):
+        with self._lock:
+            key = hash(tuple(token_ids))
+            if key not in self._entries:
+                self._entries[key] = (list(token_ids), None)
+                self._lengths = sorted(set(self._lengths) | {len(token_ids)}, reverse=True)
+
+    def store(self, token_ids, kv):
+        with self._lock:
+            self._entries[hash(tuple(token_ids))] = (list(token_ids), kv)
+
+    def match(self, token_ids):
+        """Return (prefix ids, kv) of the longest registered prefix of `token_ids`.
+
+        kv is None until the prefix has been computed once.
+        """
+        with self._lock:
+            for length in self._lengths:
+                if length > len(token_ids):
+                    continue
+                entry = self._entries.get(hash(tuple(token_ids[:length])))
+                if entry is not None and entry[0] == token_ids[:length]:
+                    return entry
+        return None
@@ -0,0 +1,201 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+FILLERS = ["Hmm", "Wait", "Let me think", "I think", "Maybe", "Possibly", "Alternatively",
+           "Should I", "Now I need to", "So", "Alright", "Anyway"]
+
+FILLER_PATTERN = re.compile(r'(?i)\b(' + '|'.join(FILLERS) + r')\b.*')
+
+# The start of a multi-word filler at the end of streamed text ("I",
+# "Let me", "Now I need"), which the next words may still complete
+FILLER_PREFIX_PATTERN = re.compile(r'(?i)\b(' + '|'.join(
+    r'\s+'.join(map(re.escape, words[:k]))
+    for words in (filler.split() for filler in FILLERS)
+    for k in range(1, len(words))
+) + r')\s*$')
+
+# The model starting a new dialog turn: everything after it is hallucinated
+TURN_PATTERN = re.compile(r"(User:|Assistant:)")
+
+
+def strip_noise(response: str) -> str:
+    # Remove XML-style tags like </think>
+    response = re.sub(r"<.*?>", "", response)
+
+    # Remove hallucinated dialog continuation
+    response = re.split(r"\b(User:|Assistant:)\b", response)[0].strip()
+
+    # Remove filler/thinking phrases
+    return FILLER_PATTERN.sub('', response).strip()
+
+
+def split_sentences(response: str) -> list:
+    return re.split(r'(?<=[.!?]) +', response)
+
+
+class ResponseCleaner:
+    """Turns raw model output into the answer shown to the user.
+
+    max_sentences: keep only the first N sentences (None keeps everything)
+    filter_noise: drop tags, a <think> reasoning block and 'thinking out loud' phrases
+    cut_turns: stop at the first hallucinated User:/Assistant: turn
+    single_line: join the answer onto one line
+    ensure_period: end the answer with sentence punctuation
+    """
+
+    def __init__(self, max_sentences=None, filter_noise=False, cut_turns=True,
+                 single_line=False, ensure_period=False):
+        self.max_sentences = max_sentences
+        self.filter_noise = filter_noise
+        self.cut_turns = cut_turns
+        self.single_line = single_line
+        self.ensure_period = ensure_period
+
+    def clean(self, raw: str) -> str:
+        # Reasoning that never finished is all there is to show
+        answer = self.answer_part(raw)
+        response, _ = self.trim(self.cut_turn(raw if answer is None else answer)[0])
+        if self.ensure_period and not response.endswith(('.', '!', '?')):
+            response += '.'
+        return response
+
+    def stream(self):
+        return ResponseStream(self)
+
+    def is_complete(self, text: str) -> bool:
+        """Whether the kept answer can no longer change, so decoding can stop."""
+        text = self.answer_part(text)
+        if text is None:
+            return False
+        text, turn = self.cut_turn(text)
+        if turn:
+            return True
+        if not self.max_sentences:
+            return False
+
+        response = strip_noise(text) if self.filter_noise else text.strip()
+        sentences = split_sentences(response)
+        if len(sentences) > self.max_sentences:
+            return True
+        # The last kept sentence has ended once whitespace follows its punctuation
+        return (len(sentences) == self.max_sentences and response.endswith(('.', '!', '?'))
+                and text[-1:].isspace())
+
+    def answer_part(self, text: str):
+        """Drop a <think>...</think> reasoning block; None while it is still open."""
+        if not self.filter_noise:
+            return text
+        start = text.find("<think>")
+        if start == -1:
+            return text
+        end = text.find("</think>", start)
+        if end == -1:
+            return None
+        return text[:start] + text[end + len("</think>"):]
+
+    def cut_turn(self, text: str):
+        """Return the text before a new dialog turn and whether one was found."""
+        turn = TURN_PATTERN.search(text) if self.cut_turns else None
+        if turn:
+            return text[:turn.start()], True
+        return text, False
+
+    def trim(self, response: str):
+        """Return the kept answer and whether more sentences followed it."""
+        if self.filter_noise:
+            response = strip_noise(response)
+        response = response.strip()
+
+        complete = False
+        if self.max_sentences:
+            sentences = split_sentences(response)
+            complete = len(sentences) > self.max_sentences
+            response = " ".join(sentences[:self.max_sentences]).strip()
+
+        if self.single_line:
+            response = response.replace('\n', ' ')
+        return response, complete
+
+
+class ResponseStream:
+    """Applies a ResponseCleaner to generated text as it streams in."""
+
+    def __init__(self, cleaner):
+        self.cleaner = cleaner
+        self.raw = ""
+        self.sent = ""
+        self.complete = False
+
+    def feed(self, text: str) -> str:
+        """Add newly generated text and return the fragment that is safe to show."""
+        self.raw += text
+        if self.complete:
+            return ""
+
+        # Hold back an unclosed tag and the trailing partial word until they settle
+        stable = self.raw
+        tag_start = stable.rfind("<")
+        if self.cleaner.filter_noise and tag_start > stable.rfind(">"):
+            stable = stable[:tag_start]
+        stable = stable[:max(stable.rfind(" "), stable.rfind("\n"), 0)]
+
+        # Nothing to show while the model is still reasoning
+        stable = self.cleaner.answer_part(stable)
+        if stable is None:
+            return ""
+
+        stable, self.complete = self.cleaner.cut_turn(stable)
+        # A filler's first words look like an answer until the rest arrives
+        prefix = FILLER_PREFIX_PATTERN.search(stable) if self.cleaner.filter_noise and not self.complete else None
+        if prefix and not any(m.start() <= prefix.start() <= m.end() for m in FILLER_PATTERN.finditer(stable)):
+            stable = stable[:prefix.start()]
+        response, complete = self.cleaner.trim(stable)
+        self.complete = self.complete or complete
+        return self._advance(response)
+
+    def finish(self) -> str:
+        """Return whatever is left of the final cleaned answer."""
+        response = self.cleaner.clean(self.raw)
+        if not response.startswith(self.sent):
+            logger.warning(f"Streamed answer {self.sent!r} is not a prefix of the cleaned answer {response!r}")
+        return self._advance(response)
+
+    @property
+    def text(self) -> str:
+        """The answer as sent so far."""
+        return self.sent
+
+    def _advance(self, response: str) -> str:
+        if not response.startswith(self.sent):
+            return ""
+        fragment = response[len(self.sent):]
+        self.sent = response
+        return fragment
+
+
+if __name__ == "__main__":
+    # Self-check: streaming in word and token sized pieces must send exactly clean(raw)
+    from .generator import PROFILES
+
+    samples = [
+        "Paris is the capital of France. I think it is nice and big.",
+        "Sure. Let me think about it. The answer is 42.",
+        "Should we go? Should I go now",
+        "<think>The user asks for a sum.</think> The answer is 4. Now I need to check it.",
+        "Now is the time. Now I see it",
+        "Yes, it is open. User: and on Sunday? Assistant: no",
+    ]
+    failures = 0
+    for name, settings in PROFILES.items():
+        cleaner = ResponseCleaner(**settings["cleaning"])
+        for raw in samples:
+            for pieces in (re.findall(r"\S+\s*|\s+", raw), [raw[i:i + 3] for i in range(0, len(raw), 3)]):
+                stream = cleaner.stream()
+                streamed = "".join(stream.feed(piece) for piece in pieces) + stream.finish()
+                if streamed != cleaner.clean(raw):
+                    failures += 1
+                    print(f"{name}: streamed {streamed!r}, expected {cleaner.clean(raw)!r}")
+    print(f"{failures} mismatches")
+    raise SystemExit(1 if failures else 0)
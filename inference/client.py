@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# How often a frontend retries an inference server that is not up or ready yet
+POLL_SECONDS = 2.0
+
+
+class RemoteGenerator:
+    """Generator interface backed by a separate `python -m inference.server` process.
+
+    Lets several frontends on one box share a single copy of the weights.
+    Prefixes must be registered before `start`. The server may start after
+    the frontend: `start` keeps retrying it in the background, and
+    `wait_ready` returns once the prefixes are registered and the server
+    reports ready.
+    """
+
+    def __init__(self, url: str, timeout: float = 300.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._client = None
+        self._connector = None
+        self._prefixes = []
+
+    async def start(self, wait=True):
+        if self._connector is None:
+            self._client = httpx.AsyncClient(base_url=self.url, timeout=self.timeout)
+            self._connector = asyncio.create_task(self._connect())
+        if wait:
+            await self.wait_ready()
+
+    async def _connect(self):
+        registered = 0
+        while True:
+            try:
+                while registered < len(self._prefixes):
+                    response = await self._client.post("/prefixes", json={"text": self._prefixes[registered]})
+                    response.raise_for_status()
+                    registered += 1
+                response = await self._client.get("/readyz")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError as e:
+                logger.warning(f"Inference server at {self.url} not reachable yet: {e}")
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def wait_ready(self):
+        if self._connector is None:
+            raise RuntimeError("RemoteGenerator.start() has not been called")
+        await asyncio.shield(self._connector)
+
+    async def status(self) -> dict:
+        try:
+            response = await self._client.get("/readyz")
+        except httpx.HTTPError as e:
+            return {"ready": False, "state": "unreachable", "error": str(e)}
+        status = response.json()
+        if status.get("ready") and not self._connector.done():
+            # Still registering prefixes with the server
+            status.update(ready=False, state="connecting")
+        return status
+
+    async def stop(self):
+        if self._connector is not None and not self._connector.done():
+            self._connector.cancel()
+        self._connector = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def register_prefix(self, text: str):
+        self._prefixes.append(text)
+
+    async def release_session(self, session_id: str):
+        try:
+            await self._client.delete(f"/sessions/{session_id}")
+        except httpx.HTTPError as e:
+            # The server drops idle sessions by itself; nothing else to do
+            logger.warning(f"Could not release session {session_id}: {e}")
+
+    async def stream(self, prompt: str, profile: str = "chat", session_id=None):
+        await self.wait_ready()
+        payload = {"prompt": prompt, "profile": profile, "session_id": session_id}
+        async with self._client.stream("POST", "/generate", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise RuntimeError(message["error"])
+                yield message["text"]
+
+    async def generate(self, prompt: str, profile: str = "chat", session_id=None) -> str:
+        return "".join([fragment async for fragment in self.stream(prompt, profile, session_id)])
+
+    async def metrics(self) -> dict:
+        response = await self._client.get("/metrics")
+        response.raise_for_status()
+        return response.json()
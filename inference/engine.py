@@ -0,0 +1,391 @@
+import asyncio
+import logging
+import queue
+import threading
+
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+
+from .cache import PrefixCache, SessionCache, common_prefix_length
+
+logger = logging.getLogger(__name__)
+
+# Sampling settings understood by the engine, with the values used when neither
+# the caller nor the model's generation_config sets them
+DEFAULT_PARAMS = {
+    "max_new_tokens": 256,
+    "do_sample": False,
+    "temperature": 1.0,
+    "top_p": 1.0,
+    "repetition_penalty": 1.0,
+}
+
+
+def _to_legacy(cache):
+    """Return past key/values as a tuple of (key, value) pairs per layer."""
+    if isinstance(cache, tuple):
+        return cache
+    return cache.to_legacy_cache()
+
+
+def _pad_left(tensor, width, dim):
+    """Left pad `tensor` with zeros along `dim` up to `width`."""
+    missing = width - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    padding = [0, 0] * (tensor.dim() - dim - 1) + [missing, 0]
+    return F.pad(tensor, padding)
+
+
+class _Sequence:
+    """One generation request moving through the engine."""
+
+    def __init__(self, prompt_ids, params, loop, session_id=None, stop_condition=None):
+        self.prompt_ids = prompt_ids
+        self.params = params
+        self.session_id = session_id
+        self.stop_condition = stop_condition
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.generated = []
+        self.emitted = ""
+        self.next_token = None
+        self.finished = False
+        self.cancelled = False
+
+    def push(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            # The caller's event loop is gone, nobody is listening any more
+            self.cancelled = True
+
+
+class InferenceEngine:
+    """Continuous batching scheduler shared by every session of a frontend.
+
+    Requests are queued and admitted into a running batch between decoding
+    steps; every step runs one forward pass for all active sequences and
+    finished sequences leave the batch right away, so a long answer no
+    longer makes every other session wait for it to complete.
+
+    Requests tagged with a session id keep their past key/values after the
+    turn, so the next turn of that conversation only prefills the part of
+    the prompt that changed. Prefixes registered with `register_prefix`
+    (system prompts, fixed instructions) are computed once and shared by
+    every request that starts with them.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=8,
+                 session_cache_bytes=512 * 1024 ** 2, session_idle_seconds=600):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.device = model.device
+        self.sessions = SessionCache(session_cache_bytes, session_idle_seconds)
+        self.prefixes = PrefixCache()
+
+        eos = model.generation_config.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, list) else [eos])
+        self.eos_token_ids.add(tokenizer.eos_token_id)
+        self.eos_token_ids.discard(None)
+
+        self._pending = queue.Queue()
+        self._thread = None
+        self._running = False
+
+        # Counters read by Generator.metrics(), only written by the engine thread
+        self.stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0,
+            "generated_tokens": 0,
+            "decode_steps": 0,
+            "batched_sequences": 0,
+        }
+
+        # Batch state: one row per active sequence, keys/values left padded
+        self._active = []
+        self._kv = None
+        self._mask = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="inference-engine", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._running = False
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+        # Requests queued after the thread exited would otherwise wait forever
+        self._fail_pending(RuntimeError("Inference engine stopped"))
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    async def stream(self, prompt: str, session_id=None, stop_condition=None, **generation_kwargs):
+        """Yield the generated text for `prompt` piece by piece.
+
+        `stop_condition` is called with the text generated so far after every
+        token; decoding ends as soon as it returns True.
+        """
+        if not self._running:
+            raise RuntimeError("Inference engine is not running")
+        seq = _Sequence(
+            self.tokenizer(prompt)["input_ids"],
+            self._sampling_params(generation_kwargs),
+            asyncio.get_running_loop(),
+            session_id,
+            stop_condition,
+        )
+        self._pending.put(seq)
+        try:
+            while (item := await seq.queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Lets the scheduler drop the sequence if the caller stopped early
+            seq.cancelled = True
+
+    async def generate(self, prompt: str, session_id=None, stop_condition=None, **generation_kwargs) -> str:
+        """Return the full generated text for `prompt`."""
+        stream = self.stream(prompt, session_id, stop_condition, **generation_kwargs)
+        return "".join([text async for text in stream])
+
+    def register_prefix(self, text: str):
+        """Share the key/values of `text` with every prompt that starts with it."""
+        # The last token may merge with whatever follows the prefix in a real
+        # prompt, so it is left out of the shared part
+        token_ids = self.tokenizer(text)["input_ids"][:-1]
+        if token_ids:
+            self.prefixes.register(token_ids)
+
+    def release_session(self, session_id):
+        """Free the cached key/values of a session that has ended."""
+        self.sessions.release(session_id)
+
+    def _sampling_params(self, generation_kwargs):
+        config = self.model.generation_config
+        params = {}
+        for name, default in DEFAULT_PARAMS.items():
+            value = generation_kwargs.get(name, getattr(config, name, None))
+            params[name] = default if value is None else value
+        return params
+
+    def _run(self):
+        try:
+            with torch.inference_mode():
+                while self._running:
+                    try:
+                        self._admit()
+                        if not self._active:
+                            continue
+                        self._step()
+                        self._retire()
+                    except Exception as e:
+                        # Fail the batch but keep serving: callers get the error
+                        # instead of waiting on a thread that has died
+                        logger.exception(f"Decoding step failed: {e}")
+                        self._fail_active(e)
+        finally:
+            error = RuntimeError("Inference engine stopped")
+            self._fail_active(error)
+            self._fail_pending(error)
+
+    def _fail_active(self, error):
+        for seq in self._active:
+            seq.push(error)
+        self._active, self._kv, self._mask = [], None, None
+
+    def _fail_pending(self, error):
+        while True:
+            try:
+                seq = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if seq is not None:
+                seq.push(error)
+
+    def _admit(self):
+        """Prefill queued requests and add them to the running batch."""
+        block = not self._active
+        while len(self._active) < self.max_batch_size:
+            try:
+                seq = self._pending.get(block=block)
+            except queue.Empty:
+                return
+            if seq is None:
+                return
+            block = False
+            if seq.cancelled:
+                continue
+
+            try:
+                kv = self._prefill(seq)
+                if seq.finished:
+                    self._save_session(seq, kv)
+                else:
+                    self._join(seq, kv)
+            except Exception as e:
+                logger.error(f"Prefill failed: {e}")
+                seq.push(e)
+
+    def _prefill(self, seq):
+        past, reused = self._cached_prefix(seq)
+        self.stats["requests"] += 1
+        self.stats["prompt_tokens"] += len(seq.prompt_ids)
+        self.stats["cached_prompt_tokens"] += reused
+        input_ids = torch.tensor([seq.prompt_ids[reused:]], device=self.device)
+        outputs = self.model(input_ids=input_ids, past_key_values=past, use_cache=True)
+        self._accept(seq, self._sample(outputs.logits[0, -1], seq))
+        return _to_legacy(outputs.past_key_values)
+
+    def _cached_prefix(self, seq):
+        """Return the longest cached key/values still valid for this prompt."""
+        # The last prompt token is always recomputed to get its logits
+        prompt_ids = seq.prompt_ids[:-1]
+        kv, reused = None, 0
+
+        entry = self.sessions.take(seq.session_id) if seq.session_id else None
+        if entry is not None:
+            token_ids, kv = entry
+            reused = common_prefix_length(token_ids, prompt_ids)
+
+        shared = self.prefixes.match(prompt_ids)
+        if shared is not None and len(shared[0]) > reused:
+            token_ids, kv = shared
+            reused = len(token_ids)
+            if kv is None:
+                kv = self._compute_prefix(token_ids)
+
+        if not reused:
+            return None, 0
+        kv = tuple((key[:, :, :reused], value[:, :, :reused]) for key, value in kv)
+        return DynamicCache.from_legacy_cache(kv), reused
+
+    def _compute_prefix(self, token_ids):
+        input_ids = torch.tensor([token_ids], device=self.device)
+        kv = _to_legacy(self.model(input_ids=input_ids, use_cache=True).past_key_values)
+        self.prefixes.store(token_ids, kv)
+        return kv
+
+    def _save_session(self, seq, kv):
+        if seq.session_id is None:
+            return
+        length = kv[0][0].shape[2]
+        # Copy so the entry does not keep the whole batch tensors alive
+        kv = tuple((key.clone(), value.clone()) for key, value in kv)
+        self.sessions.put(seq.session_id, (seq.prompt_ids + seq.generated)[:length], kv)
+
+    def _join(self, seq, kv):
+        length = kv[0][0].shape[2]
+        mask = torch.ones(1, length, dtype=torch.long, device=self.device)
+        if self._kv is not None:
+            width = max(self._mask.shape[1], length)
+            # Build the new batch before replacing it, so a failure leaves it intact
+            kv = tuple(
+                (
+                    torch.cat([_pad_left(key, width, 2), _pad_left(new_key, width, 2)]),
+                    torch.cat([_pad_left(value, width, 2), _pad_left(new_value, width, 2)]),
+                )
+                for (key, value), (new_key, new_value) in zip(self._kv, kv)
+            )
+            mask = torch.cat([_pad_left(self._mask, width, 1), _pad_left(mask, width, 1)])
+        self._kv, self._mask = kv, mask
+        self._active.append(seq)
+
+    def _step(self):
+        """Run one decoding step for every active sequence in a single forward pass."""
+        input_ids = torch.tensor([[seq.next_token] for seq in self._active], device=self.device)
+        mask = torch.cat([self._mask, self._mask.new_ones(len(self._active), 1)], dim=1)
+        position_ids = mask.sum(dim=1, keepdim=True) - 1
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache.from_legacy_cache(self._kv),
+            use_cache=True,
+        )
+        self._kv = _to_legacy(outputs.past_key_values)
+        self._mask = mask
+        self.stats["decode_steps"] += 1
+        self.stats["batched_sequences"] += len(self._active)
+
+        for row, seq in enumerate(self._active):
+            if not seq.cancelled:
+                self._accept(seq, self._sample(outputs.logits[row, -1], seq))
+
+    def _retire(self):
+        """Drop finished and cancelled sequences from the batch."""
+        keep = [row for row, seq in enumerate(self._active) if not (seq.finished or seq.cancelled)]
+        if len(keep) == len(self._active):
+            return
+
+        for row, seq in enumerate(self._active):
+            if row not in keep and seq.session_id is not None:
+                start = int(self._mask[row].nonzero()[0])
+                self._save_session(seq, tuple(
+                    (key[row:row + 1, :, start:], value[row:row + 1, :, start:]) for key, value in self._kv
+                ))
+
+        if not keep:
+            self._active, self._kv, self._mask = [], None, None
+            return
+
+        index = torch.tensor(keep, device=self.device)
+        mask = self._mask[index]
+        # Padding columns that only the retired sequences needed can go too
+        start = int((mask.sum(dim=0) > 0).nonzero()[0])
+        self._mask = mask[:, start:]
+        self._kv = tuple((key[index, :, start:], value[index, :, start:]) for key, value in self._kv)
+        self._active = [self._active[row] for row in keep]
+
+    def _accept(self, seq, token):
+        seq.generated.append(token)
+        self.stats["generated_tokens"] += 1
+        seq.next_token = token
+        if token in self.eos_token_ids or len(seq.generated) >= seq.params["max_new_tokens"]:
+            seq.finished = True
+
+        text = self.tokenizer.decode(seq.generated, skip_special_tokens=True)
+        if not seq.finished and seq.stop_condition is not None and seq.stop_condition(text):
+            seq.finished = True
+
+        # Hold back text while the last token ends in an incomplete character
+        if (seq.finished or not text.endswith("\ufffd")) and text.startswith(seq.emitted):
+            fragment = text[len(seq.emitted):]
+            seq.emitted = text
+            if fragment:
+                seq.push(fragment)
+
+        if seq.finished:
+            seq.push(None)
+
+    def _sample(self, logits, seq):
+        params = seq.params
+        logits = logits.float()
+
+        penalty = params["repetition_penalty"]
+        if penalty != 1.0:
+            seen = torch.tensor(seq.prompt_ids + seq.generated, device=logits.device).unique()
+            scores = logits[seen]
+            logits[seen] = torch.where(scores < 0, scores * penalty, scores / penalty)
+
+        if not params["do_sample"]:
+            return int(logits.argmax())
+
+        probs = torch.softmax(logits / max(params["temperature"], 1e-5), dim=-1)
+        if params["top_p"] < 1.0:
+            sorted_probs, sorted_ids = probs.sort(descending=True)
+            # Drop a token once the tokens ranked above it already cover top_p
+            sorted_probs[(sorted_probs.cumsum(-1) - sorted_probs) > params["top_p"]] = 0
+            return int(sorted_ids[torch.multinomial(sorted_probs, 1)])
+        return int(torch.multinomial(probs, 1))
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+
+from .cleaning import ResponseCleaner
+from .engine import InferenceEngine
+from .loading import MODEL_NAME, load_model
+
+logger = logging.getLogger(__name__)
+
+# Generation settings and answer cleaning for each frontend
+PROFILES = {
+    # chatbot/chatbot.py: one or two sentence answers
+    "chat": {
+        "generation": dict(max_new_tokens=256, do_sample=True, temperature=0.7, top_p=0.9, repetition_penalty=1.2),
+        "cleaning": dict(max_sentences=2, filter_noise=True, ensure_period=True),
+    },
+    # chatbot/chatbot_db.py: up to three sentences on a single line
+    "chat_db": {
+        "generation": dict(max_new_tokens=100, do_sample=True, temperature=0.5, top_p=0.8, repetition_penalty=1.4),
+        "cleaning": dict(max_sentences=3, filter_noise=True, single_line=True, ensure_period=True),
+    },
+    # chatbot_2_models/main.py: LLM answer when the knowledge base has no match
+    "rag_fallback": {
+        "generation": dict(max_new_tokens=150, temperature=0.7, top_p=0.9, repetition_penalty=1.1),
+        "cleaning": dict(single_line=True, ensure_period=True),
+    },
+    # websocket/fastapi_websocket.py: the model's output as generated, up to
+    # any User:/Assistant: turn it goes on to invent
+    "raw": {
+        "generation": dict(max_new_tokens=256, do_sample=True),
+        "cleaning": dict(cut_turns=True),
+    },
+    # test/ scripts: the model's own sampling defaults, output as generated
+    "test": {
+        "generation": dict(max_new_tokens=200),
+        "cleaning": dict(cut_turns=False),
+    },
+}
+
+
+class Generator:
+    """The DeepSeek model behind one interface shared by every frontend.
+
+    Owns model loading, the batching engine, generation profiles, response
+    cleaning and metrics. `stream` and `generate` return answers already
+    cleaned according to the profile, waiting for the model if it is still
+    loading.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, precision=None, device="cpu", max_batch_size=8):
+        self.model_name = model_name
+        self.precision = precision
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.engine = None
+        self._loader = None
+        self._prefixes = []
+        self._status = {"state": "idle", "stage": None, "started": None, "error": None}
+        self._metrics = {
+            "requests": 0,
+            "failures": 0,
+            "first_fragment_seconds": 0.0,
+            "total_seconds": 0.0,
+        }
+
+    async def start(self, wait=True):
+        """Load the model in a worker thread and start the engine.
+
+        With wait=False loading carries on in the background so the server
+        can bind its port right away; `status` reports the progress.
+        """
+        if self._loader is None:
+            self._loader = asyncio.create_task(self._load())
+        if wait:
+            await self.wait_ready()
+
+    async def wait_ready(self):
+        if self._loader is None:
+            raise RuntimeError("Generator.start() has not been called")
+        await asyncio.shield(self._loader)
+
+    async def stop(self):
+        if self._loader is not None and not self._loader.done():
+            self._loader.cancel()
+        if self.engine is not None:
+            await asyncio.to_thread(self.engine.stop)
+
+    async def status(self) -> dict:
+        if self._status["state"] == "ready" and not self.engine.alive:
+            self._status.update(state="failed", error="Inference engine stopped")
+        started = self._status["started"]
+        return {
+            "ready": self._status["state"] == "ready",
+            "state": self._status["state"],
+            "stage": self._status["stage"],
+            "elapsed_seconds": round(time.monotonic() - started, 1) if started else 0,
+            "error": self._status["error"],
+        }
+
+    async def _load(self):
+        self._status.update(state="loading", started=time.monotonic())
+        try:
+            tokenizer, model = await asyncio.to_thread(
+                load_model, self.model_name, self.precision, self.device, self._set_stage
+            )
+            self.engine = InferenceEngine(model, tokenizer, self.max_batch_size)
+            for text in self._prefixes:
+                self.engine.register_prefix(text)
+            self.engine.start()
+        except Exception as e:
+            logger.error(f"Model loading failed: {e}")
+            self._status.update(state="failed", error=str(e))
+            raise
+        self._status.update(state="ready", stage=None)
+
+    def _set_stage(self, stage):
+        self._status["stage"] = stage
+
+    def register_prefix(self, text: str):
+        """Precompute `text` once for every prompt that starts with it."""
+        if text in self._prefixes:
+            return
+        self._prefixes.append(text)
+        if self.engine is not None:
+            self.engine.register_prefix(text)
+
+    async def release_session(self, session_id: str):
+        if self.engine is not None:
+            self.engine.release_session(session_id)
+
+    async def stream(self, prompt: str, profile: str = "chat", session_id=None):
+        """Yield fragments of the cleaned answer as they are generated."""
+        settings = PROFILES[profile]
+        await self.wait_ready()
+        cleaner = ResponseCleaner(**settings["cleaning"])
+        stream = cleaner.stream()
+        started = time.perf_counter()
+        first_fragment = None
+        self._metrics["requests"] += 1
+        try:
+            # Decoding stops as soon as the kept answer is complete
+            generated = self.engine.stream(prompt, session_id, cleaner.is_complete, **settings["generation"])
+            async for text in generated:
+                fragment = stream.feed(text)
+                if fragment:
+                    first_fragment = first_fragment or time.perf_counter()
+                    yield fragment
+
+            fragment = stream.finish()
+            if fragment:
+                first_fragment = first_fragment or time.perf_counter()
+                yield fragment
+        except Exception:
+            self._metrics["failures"] += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            self._metrics["first_fragment_seconds"] += (first_fragment or finished) - started
+            self._metrics["total_seconds"] += finished - started
+
+    async def generate(self, prompt: str, profile: str = "chat", session_id=None) -> str:
+        """Return the cleaned answer once it is complete."""
+        return "".join([fragment async for fragment in self.stream(prompt, profile, session_id)])
+
+    async def metrics(self) -> dict:
+        requests = self._metrics["requests"] or 1
+        return {
+            "requests": self._metrics["requests"],
+            "failures": self._metrics["failures"],
+            "avg_first_fragment_seconds": round(self._metrics["first_fragment_seconds"] / requests, 3),
+            "avg_total_seconds": round(self._metrics["total_seconds"] / requests, 3),
+            **(self.engine.stats if self.engine is not None else {}),
+        }
+
+
+def create_generator(**kwargs):
+    """Return an in-process Generator, or a client for the inference server when INFERENCE_URL is set."""
+    url = os.getenv("INFERENCE_URL")
+    if url:
+        from .client import RemoteGenerator
+        return RemoteGenerator(url)
+    return Generator(**kwargs)
@@ -0,0 +1,143 @@
+import argparse
+import logging
+import os
+from pathlib import Path
+
+import torch
+from safetensors.torch import load_file, save_model
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, GenerationConfig
+
+try:
+    from transformers.initialization import no_init_weights
+except ImportError:  # transformers < 5
+    from transformers.modeling_utils import no_init_weights
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
+
+# fp16 matmuls are slow on most CPUs, so CPU deployments default to fp32;
+# int8 applies dynamic quantization to every Linear layer (CPU only)
+PRECISIONS = {
+    "fp32": torch.float32,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+    "int8": torch.float32,
+}
+
+# Weights converted to the serving precision are written here once and
+# memory-mapped on later boots
+SNAPSHOT_DIR = Path(os.getenv("MODEL_SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "models"))
+
+
+def default_precision(device):
+    return os.getenv("MODEL_PRECISION") or ("fp16" if str(device).startswith("cuda") else "fp32")
+
+
+def snapshot_path(model_name, precision):
+    suffix = "pt" if precision == "int8" else "safetensors"
+    return SNAPSHOT_DIR / f"{model_name.replace('/', '--')}-{precision}.{suffix}"
+
+
+def load_model(model_name=MODEL_NAME, precision=None, device="cpu", progress=None):
+    """Load tokenizer and causal LM in the requested precision.
+
+    `precision` is one of PRECISIONS and defaults to the MODEL_PRECISION
+    environment variable. `progress` is called with the name of each
+    loading stage.
+    """
+    precision = precision or default_precision(device)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    if precision == "int8" and str(device) != "cpu":
+        raise ValueError("int8 dynamic quantization is only supported on CPU")
+    progress = progress or (lambda stage: None)
+
+    logger.info(f"Loading {model_name} ({precision}) on {device}...")
+    progress("tokenizer")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    progress("weights")
+    if precision == "int8":
+        model = _load_int8(model_name, progress)
+    elif str(device) == "cpu":
+        model = _load_snapshot(model_name, precision, progress)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=PRECISIONS[precision])
+        model.to(device)
+    model.eval()
+    return tokenizer, model
+
+
+def _empty_model(model_name, dtype):
+    """Build the module structure without spending time on random init."""
+    config = AutoConfig.from_pretrained(model_name)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=dtype)
+    # from_config skips generation_config.json; load it as from_pretrained does
+    # so sampling defaults are the same on every boot
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(model_name)
+    except OSError:
+        logger.info(f"{model_name} has no generation_config.json, using model defaults")
+    return model
+
+
+def _load_snapshot(model_name, precision, progress):
+    """Load CPU weights from a memory-mapped safetensors snapshot.
+
+    The parameters keep pointing at the mapped file instead of private
+    copies, so worker processes loading the same snapshot share its pages.
+    """
+    path = snapshot_path(model_name, precision)
+    if not path.exists():
+        progress("converting")
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=PRECISIONS[precision], low_cpu_mem_usage=True
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_model(model, str(path))
+        logger.info(f"Saved {precision} snapshot to {path}")
+        return model
+
+    model = _empty_model(model_name, PRECISIONS[precision])
+    # Tied weights are stored once in the snapshot and re-tied below
+    model.load_state_dict(load_file(str(path)), strict=False, assign=True)
+    model.tie_weights()
+    return model
+
+
+def _quantize(model):
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_int8(model_name, progress):
+    path = snapshot_path(model_name, "int8")
+    if not path.exists():
+        progress("quantizing")
+        return quantize_and_save(model_name)
+
+    # Build the quantized module structure, then fill it with the saved weights
+    model = _quantize(_empty_model(model_name, torch.float32))
+    model.load_state_dict(torch.load(path, map_location="cpu", mmap=True))
+    return model
+
+
+def quantize_and_save(model_name=MODEL_NAME):
+    """Quantize the fp32 weights once and save them for later boots."""
+    logger.info(f"Quantizing {model_name} to int8, this only happens once...")
+    model = _quantize(AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32))
+    path = snapshot_path(model_name, "int8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(model.state_dict(), path)
+    logger.info(f"Saved quantized weights to {path}")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-build the weight snapshot so servers boot straight into it")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--precision", default="int8", choices=PRECISIONS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    load_model(args.model, args.precision)
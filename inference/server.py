@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from .generator import PROFILES, Generator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Precision comes from MODEL_PRECISION, see inference/loading.py
+generator = Generator()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind the port right away; /readyz turns 200 once the weights are loaded
+    await generator.start(wait=False)
+    yield
+    await generator.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    profile: str = "chat"
+    session_id: Optional[str] = None
+
+
+class PrefixRequest(BaseModel):
+    text: str
+
+
+@app.post("/generate")
+async def generate(request: GenerateRequest):
+    """Stream the cleaned answer as newline-delimited JSON fragments."""
+    if request.profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{request.profile}'")
+
+    async def fragments():
+        try:
+            async for fragment in generator.stream(request.prompt, request.profile, request.session_id):
+                yield json.dumps({"text": fragment}) + "\n"
+        except Exception as e:
+            logger.error(f"Generation failed: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(fragments(), media_type="application/x-ndjson")
+
+
+@app.post("/prefixes")
+async def register_prefix(request: PrefixRequest):
+    generator.register_prefix(request.text)
+    return {"message": "Prefix registered."}
+
+
+@app.delete("/sessions/{session_id}")
+async def release_session(session_id: str):
+    await generator.release_session(session_id)
+    return {"message": "Session released."}
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    status = await generator.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    return await generator.metrics()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Frontends reach it through INFERENCE_URL, e.g. http://127.0.0.1:8100
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("INFERENCE_PORT", 8100)))
@@ -0,0 +1,3 @@
+from .memory import MemoryIndex
+from .search import TOP_K, answer_from_chunk, search_chunks, search_chunks_async
+from .vector import decode_vector, encode_vector, register_vector, register_vector_adapter, vector_text
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Snapshot of rag_chunks for the in-memory backend, memory-mapped on startup
+SNAPSHOT_DIR = Path(os.getenv("RAG_SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "snapshots"))
+
+
+class MemoryIndex:
+    """rag_chunks held in process as one contiguous float32 matrix.
+
+    A search is a single matrix-vector product plus argpartition, with no
+    database round trip. The matrix is saved to a snapshot file and
+    memory-mapped, so restarts (and several workers) reuse it without
+    reading the table. `refresh_async` rebuilds it when the materials
+    change; `version` identifies the rag_chunks state it was built from.
+    """
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, name="rag_chunks"):
+        self.matrix_path = Path(snapshot_dir) / f"{name}.npy"
+        self.meta_path = Path(snapshot_dir) / f"{name}.json"
+        self._data = (np.empty((0, 0), dtype=np.float32), [])
+        self.version = None
+
+    def __len__(self):
+        return len(self._data[1])
+
+    def load(self) -> bool:
+        """Map the saved snapshot, if there is one."""
+        if not (self.matrix_path.exists() and self.meta_path.exists()):
+            return False
+        meta = json.loads(self.meta_path.read_text())
+        matrix = self._map(len(meta["chunks"]))
+        if matrix.shape[0] != len(meta["chunks"]):
+            logger.warning(f"Ignoring inconsistent snapshot {self.matrix_path}")
+            return False
+        self._data = (matrix, meta["chunks"])
+        self.version = meta["version"]
+        logger.info(f"Mapped {len(self)} chunks from {self.matrix_path}")
+        return True
+
+    def build(self, chunks, embeddings, version):
+        """Save a new snapshot from unit-length embeddings and switch to it."""
+        chunks = list(chunks)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix = np.ascontiguousarray(matrix.reshape(len(chunks), -1) if chunks else np.empty((0, 0), dtype=np.float32))
+        self.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write next to the old files and rename, so readers never map a partial file
+        tmp_matrix = self.matrix_path.with_suffix(".tmp.npy")
+        tmp_meta = self.meta_path.with_suffix(".tmp.json")
+        np.save(tmp_matrix, matrix)
+        tmp_meta.write_text(json.dumps({"version": version, "chunks": chunks}))
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_meta, self.meta_path)
+
+        self._data = (self._map(len(chunks)), chunks)
+        self.version = version
+        logger.info(f"Built in-memory index of {len(self)} chunks")
+
+    def _map(self, rows):
+        # Empty arrays cannot be memory-mapped
+        if rows == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.load(self.matrix_path, mmap_mode="r")
+
+    async def refresh_async(self, database, version):
+        """Rebuild from rag_chunks through a `databases` pool using register_vector."""
+        rows = await database.fetch_all("SELECT chunk, embedding FROM rag_chunks ORDER BY id")
+        chunks = [row["chunk"] for row in rows]
+        embeddings = [row["embedding"] for row in rows]
+        matrix = np.stack(embeddings) if embeddings else np.empty((0, 0))
+        await asyncio.to_thread(self.build, chunks, matrix, version)
+
+    def search(self, embedding, top_k=3) -> list:
+        """(chunk, cosine distance) of the nearest chunks, closest first."""
+        matrix, chunks = self._data
+        if not chunks:
+            return []
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        k = min(top_k, len(chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(chunks[i], float(1 - scores[i])) for i in top]
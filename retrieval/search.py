@@ -0,0 +1,39 @@
+from db import search_settings
+
+TOP_K = 3
+
+# The query vector is bound once and the rows come back in index order:
+# pgvector can only use its ANN index for ORDER BY <distance> LIMIT k, so
+# similarity thresholds are applied to the results in Python
+SEARCH_SQL = """
+    SELECT chunk, embedding <=> {vector} AS distance
+    FROM rag_chunks
+    ORDER BY distance
+    LIMIT {limit}
+"""
+
+
+def search_chunks(cur, embedding, top_k=TOP_K) -> list:
+    """(chunk, cosine distance) of the nearest chunks, closest first (psycopg2 cursor)."""
+    for statement in search_settings():
+        cur.execute(statement)
+    cur.execute(SEARCH_SQL.format(vector="%s::vector", limit="%s"), (embedding, top_k))
+    return cur.fetchall()
+
+
+async def search_chunks_async(database, embedding, top_k=TOP_K) -> list:
+    """Same as search_chunks on a `databases` pool using register_vector."""
+    async with database.transaction():
+        for statement in search_settings():
+            await database.execute(statement)
+        rows = await database.fetch_all(
+            SEARCH_SQL.format(vector="CAST(:embedding AS vector)", limit=":top_k"),
+            {"embedding": embedding, "top_k": top_k},
+        )
+    return [(row["chunk"], row["distance"]) for row in rows]
+
+
+def answer_from_chunk(chunk: str) -> str:
+    """Chunks are stored as 'question,answer'."""
+    parts = chunk.split(",", 1)
+    return parts[1].strip() if len(parts) > 1 else chunk.strip()
@@ -0,0 +1,34 @@
+import struct
+
+import numpy as np
+
+# pgvector's binary wire format: dimension and an unused int16, then big-endian float4 values
+_HEADER = struct.Struct(">HH")
+
+
+def encode_vector(value) -> bytes:
+    arr = np.asarray(value, dtype=">f4")
+    return _HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+def vector_text(value) -> str:
+    """pgvector text format, e.g. '[0.1,0.2]', for psycopg2 and COPY."""
+    return "[" + ",".join(map(str, np.asarray(value, dtype=np.float32).tolist())) + "]"
+
+
+async def register_vector(conn):
+    """asyncpg connection init: send and receive `vector` in binary instead of text."""
+    await conn.set_type_codec(
+        "vector", schema="public", encoder=encode_vector, decoder=decode_vector, format="binary"
+    )
+
+
+def register_vector_adapter():
+    """Let psycopg2 pass NumPy arrays as vector parameters (cast with ::vector)."""
+    from psycopg2.extensions import AsIs, register_adapter
+    register_adapter(np.ndarray, lambda arr: AsIs("'" + vector_text(arr) + "'"))
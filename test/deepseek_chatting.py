@@ -1,39 +1,44 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import asyncio
+import sys
+from pathlib import Path
 import torch
 
-# Load the model and tokenizer
-model_name = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float16, device_map="auto")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import Generator
 
-# Chat history
-chat_history = []
 
-print("🤖 DeepSeek Chatbot - Type 'exit' to stop.\n")
+async def main():
+    # Load the model and tokenizer
+    generator = Generator(device="cuda" if torch.cuda.is_available() else "cpu")
+    await generator.start()
 
-while True:
-    # User input
-    user_input = input("You: ")
-    if user_input.lower() == "exit":
-        print("Goodbye! 👋")
-        break
+    # Chat history
+    chat_history = []
 
-    # Append user message to history
-    chat_history.append(f"User: {user_input}")
+    print("🤖 DeepSeek Chatbot - Type 'exit' to stop.\n")
 
-    # Format conversation history
-    context = "\n".join(chat_history) + "\nAI:"
+    while True:
+        # User input
+        user_input = await asyncio.to_thread(input, "You: ")
+        if user_input.lower() == "exit":
+            print("Goodbye! 👋")
+            break
 
-    # Tokenize input
-    inputs = tokenizer(context, return_tensors="pt").to("cuda" if torch.cuda.is_available() else "cpu")
+        # Append user message to history
+        chat_history.append(f"User: {user_input}")
 
-    # Generate response
-    output = model.generate(**inputs, max_new_tokens=200)
-    response = tokenizer.decode(output[0], skip_special_tokens=True).split("AI:")[-1].strip()
+        # Format conversation history
+        context = "\n".join(chat_history) + "\nAI:"
 
-    # Show AI response
-    print(f"AI: {response}")
+        # Generate response
+        response = (await generator.generate(context, "test")).split("AI:")[-1].strip()
 
-    # Append AI response to history
-    chat_history.append(f"AI: {response}")
+        # Show AI response
+        print(f"AI: {response}")
 
+        # Append AI response to history
+        chat_history.append(f"AI: {response}")
+
+    await generator.stop()
+
+asyncio.run(main())
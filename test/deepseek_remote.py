@@ -1,15 +1,24 @@
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
 from fastapi import FastAPI
 from pydantic import BaseModel
-from transformers import AutoModelForCausalLM, AutoTokenizer
 import torch
 
-# Initialize FastAPI app
-app = FastAPI()
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import create_generator
+
+# Load the model at startup
+generator = create_generator(device="cuda" if torch.cuda.is_available() else "cpu")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await generator.start()
+    yield
+    await generator.stop()
 
-# Load the model
-model_name = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float16, device_map="auto")
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 # Define request model
 class ChatRequest(BaseModel):
@@ -17,12 +26,8 @@ class ChatRequest(BaseModel):
 
 # Define the chat endpoint
 @app.post("/chat/")
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     prompt = request.prompt
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda" if torch.cuda.is_available() else "cpu")
-    
-    output = model.generate(**inputs, max_new_tokens=200)
-    response = tokenizer.decode(output[0], skip_special_tokens=True)
-    
-    return {"response": response}
+    response = prompt + " " + await generator.generate(prompt, "test")
 
+    return {"response": response}
@@ -1,15 +1,21 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import asyncio
+import sys
+from pathlib import Path
 import torch
 
-model_name = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import Generator
 
-# Load the model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float16, device_map="auto")
 
-# Run inference
-prompt = "What is quantum computing?"
-inputs = tokenizer(prompt, return_tensors="pt").to("cuda" if torch.cuda.is_available() else "cpu")
+async def main():
+    # Load the model and tokenizer
+    generator = Generator(device="cuda" if torch.cuda.is_available() else "cpu")
+    await generator.start()
 
-output = model.generate(**inputs, max_new_tokens=200)
-print(tokenizer.decode(output[0], skip_special_tokens=True))
+    # Run inference
+    prompt = "What is quantum computing?"
+    print(prompt + " " + await generator.generate(prompt, "test"))
+
+    await generator.stop()
+
+asyncio.run(main())
@@ -1,6 +1,9 @@
-from sentence_transformers import SentenceTransformer
+import sys
+from pathlib import Path
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from embedding import get_encoder
 
 def embed_text(text):
-    return model.encode(text).tolist()
+    # Unit length, served from the shared query cache when the text repeats
+    return get_encoder().embed_query(text).tolist()
@@ -1,7 +1,15 @@
-import psycopg2
-from sentence_transformers import SentenceTransformer
+import hashlib
+import os
+import sys
+from pathlib import Path
 import numpy as np
 from numpy.linalg import norm
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ConnectionPool, create_vector_index, rebuild_vector_index, upsert_materials
+from embedding import get_encoder
+from retrieval import vector_text
 
 DB_PARAMS = {
     'dbname': 'chatdb',
@@ -10,122 +18,140 @@ DB_PARAMS = {
     'host': 'localhost',
     'port': 5432,
 }
-
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-
-def get_db_connection():
-    return psycopg2.connect(**DB_PARAMS)
+db_pool = ConnectionPool(**DB_PARAMS)
+
+# Questions encoded per forward pass, and rows per INSERT when loading rag_chunks
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+INSERT_PAGE_SIZE = 1000
+
+# After loads bigger than this the vector index is rebuilt in one pass
+# (concurrently, next to the old one) rather than left to incremental inserts
+REBUILD_INDEX_ROWS = int(os.getenv("RAG_REBUILD_INDEX_ROWS", 5000))
+
+def encode_questions(questions, progress=None):
+    """Unit-length embeddings of `questions`, one row each.
+
+    `progress(done, total)` is called after every slice of batches; it may
+    raise to abort the encoding.
+    """
+    # Same encoder (and EMBEDDING_BACKEND) as the chatbots, loaded on first use
+    encoder = get_encoder()
+    step = EMBED_BATCH_SIZE * 8
+    parts = [np.empty((0, encoder.dimension), dtype=np.float32)]
+    for start in range(0, len(questions), step):
+        parts.append(encoder.embed(questions[start:start + step], EMBED_BATCH_SIZE))
+        if progress:
+            progress(min(start + step, len(questions)), len(questions))
+    return np.concatenate(parts)
+
+def content_hash(chunk):
+    """Fingerprint stored with each chunk to detect edited materials"""
+    return hashlib.md5(chunk.encode("utf-8")).hexdigest()
 
 def create_rag_chunks_table():
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS rag_chunks (
-                    id SERIAL PRIMARY KEY,
-                    material_id INTEGER,
-                    user_name TEXT,
-                    chunk TEXT NOT NULL,
-                    embedding VECTOR(384),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-        conn.commit()
-
-def insert_material(question, answer):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT answer FROM training_materials WHERE question = %s", (question,))
-        result = cur.fetchone()
-        if result:
-            if result[0] != answer:
-                cur.execute("""
-                    UPDATE training_materials SET answer = %s, updated_at = NOW() WHERE question = %s
-                """, (answer, question))
-                conn.commit()
-                return 'updated'
-            else:
-                return 'duplicate'
-        else:
-            cur.execute("""
-                INSERT INTO training_materials (question, answer, updated_at)
-                VALUES (%s, %s, NOW())
-            """, (question, answer))
-            conn.commit()
-            return 'added'
-    finally:
-        cur.close()
-        conn.close()
+    with db_pool.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rag_chunks (
+                id SERIAL PRIMARY KEY,
+                material_id INTEGER,
+                user_name TEXT,
+                chunk TEXT NOT NULL,
+                embedding VECTOR(384),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Tables created before incremental reprocessing lack the hash
+        cur.execute("ALTER TABLE rag_chunks ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS rag_chunks_material_id_idx ON rag_chunks (material_id)")
+        create_vector_index(cur)
+
+def bulk_insert_materials(rows):
+    """Add or update many (question, answer) pairs at once; returns (added, updated)."""
+    with db_pool.cursor() as cur:
+        return upsert_materials(cur, rows)
 
 def update_material(material_id, new_answer):
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE training_materials
-                SET answer = %s,
-                    updated_at = NOW()
-                WHERE id = %s
-            """, (new_answer.strip(), material_id))
-        conn.commit()
+    with db_pool.cursor() as cur:
+        cur.execute("""
+            UPDATE training_materials
+            SET answer = %s,
+                updated_at = NOW()
+            WHERE id = %s
+        """, (new_answer.strip(), material_id))
 
 def delete_materials_by_ids(ids):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with db_pool.cursor() as cur:
         cur.execute("DELETE FROM training_materials WHERE id = ANY(%s::int[])", (ids,))
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
 
 def get_all_materials():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, question, answer,
-            CASE
-                WHEN updated_at IS NOT NULL THEN updated_at
-                ELSE NOW()
-            END as display_time
-        FROM training_materials
-        ORDER BY display_time DESC
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
-
-def reprocess_embeddings_from_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Fetch all training materials
-    cur.execute("SELECT id, question, answer FROM training_materials")
-    rows = cur.fetchall()
-
-    # Clear rag_chunks
-    cur.execute("DELETE FROM rag_chunks")
-
-    for record in rows:
-        material_id, question, answer = record
-        question = question.strip()
-        answer = answer.strip()
-        chunk = f"{question},{answer}"
-
-        vec = model.encode(question)
-        vec_norm = np.linalg.norm(vec)
-
-        if vec_norm == 0:
-            print(f"[Warning] Skipped zero-vector for material ID {material_id}")
-            continue
-
-        normalized_embedding = (vec / vec_norm).tolist()
-
+    with db_pool.cursor() as cur:
         cur.execute("""
-            INSERT INTO rag_chunks (material_id, chunk, embedding, user_name)
-            VALUES (%s, %s, %s, %s)
-        """, (material_id, chunk, normalized_embedding, 'admin'))
-
-    conn.commit()
-    cur.close()
-    conn.close()
+            SELECT id, question, answer,
+                CASE
+                    WHEN updated_at IS NOT NULL THEN updated_at
+                    ELSE NOW()
+                END as display_time
+            FROM training_materials
+            ORDER BY display_time DESC
+        """)
+        return cur.fetchall()
+
+def reprocess_embeddings_from_db(full=False, progress=None):
+    """Bring rag_chunks in line with training_materials.
+
+    Only new and edited materials are embedded again and chunks of deleted
+    materials are removed; full=True re-embeds everything. `progress` is
+    passed to encode_questions, and rag_chunks is left untouched if it
+    raises. Returns counts of embedded, removed and unchanged materials.
+    """
+    with db_pool.cursor() as cur:
+        # Fetch all training materials
+        cur.execute("SELECT id, question, answer FROM training_materials")
+        rows = cur.fetchall()
+        cur.execute("SELECT material_id, content_hash FROM rag_chunks")
+        indexed = dict(cur.fetchall())
+
+    chunks = {}
+    for material_id, question, answer in rows:
+        chunks[material_id] = (question.strip(), f"{question.strip()},{answer.strip()}")
+
+    changed = [
+        material_id for material_id, (_, chunk) in chunks.items()
+        if full or indexed.get(material_id) != content_hash(chunk)
+    ]
+    removed = [material_id for material_id in indexed if material_id is not None and material_id not in chunks]
+    questions = [chunks[material_id][0] for material_id in changed]
+
+    # Encode everything up front so rag_chunks is only locked for the bulk load
+    embeddings = encode_questions(questions, progress)
+
+    keep = np.linalg.norm(embeddings, axis=1) > 0
+    for material_id in np.asarray(changed)[~keep]:
+        print(f"[Warning] Skipped zero-vector for material ID {material_id}")
+
+    values = []
+    for i in np.flatnonzero(keep):
+        chunk = chunks[changed[i]][1]
+        values.append((changed[i], chunk, vector_text(embeddings[i]), 'admin', content_hash(chunk)))
+
+    # Old and new chunks swap in one transaction; searches keep reading the
+    # old rows until it commits, so they never see a gap or wait for the load
+    rebuild_index = full or len(values) > REBUILD_INDEX_ROWS
+    with db_pool.cursor() as cur:
+        if full:
+            cur.execute("DELETE FROM rag_chunks")
+        elif changed or removed:
+            cur.execute("DELETE FROM rag_chunks WHERE material_id = ANY(%s)", (changed + removed,))
+        execute_values(cur, """
+            INSERT INTO rag_chunks (material_id, chunk, embedding, user_name, content_hash)
+            VALUES %s
+        """, values, template="(%s, %s, %s::vector, %s, %s)", page_size=INSERT_PAGE_SIZE)
+        if not rebuild_index:
+            # Also creates an IVFFlat index skipped while the table was empty
+            create_vector_index(cur)
+
+    if rebuild_index:
+        with db_pool.autocommit_cursor() as cur:
+            rebuild_vector_index(cur)
+
+    return {"embedded": len(values), "removed": len(removed), "unchanged": len(chunks) - len(changed)}
@@ -0,0 +1,96 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from rag_db import reprocess_embeddings_from_db
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ReprocessJobs:
+    """Runs reprocess_embeddings_from_db in a background worker.
+
+    One job runs at a time; submitting while one is queued or running
+    returns that job instead of starting another. Cancelling stops the job
+    at the next progress report, before rag_chunks is modified. The
+    encoder itself already spreads each batch over all CPU cores.
+    """
+
+    def __init__(self, keep_finished=20):
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reprocess")
+        self._jobs = {}
+        self._cancel = {}
+        self._lock = threading.Lock()
+
+    def submit(self, full=False):
+        with self._lock:
+            for job in self._jobs.values():
+                if job["state"] in ("queued", "running"):
+                    return dict(job)
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "state": "queued",
+                "full": full,
+                "done": 0,
+                "total": 0,
+                "result": None,
+                "error": None,
+                "submitted": time.time(),
+                "finished": None,
+            }
+            self._cancel[job_id] = threading.Event()
+            self._prune()
+        self._executor.submit(self._run, job_id, full)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["state"] in ("queued", "running"):
+                self._cancel[job_id].set()
+            return dict(job)
+
+    def _run(self, job_id, full):
+        cancel = self._cancel[job_id]
+
+        def progress(done, total):
+            if cancel.is_set():
+                raise JobCancelled()
+            self._update(job_id, done=done, total=total)
+
+        if cancel.is_set():
+            self._update(job_id, state="cancelled", finished=time.time())
+            return
+        self._update(job_id, state="running")
+        try:
+            result = reprocess_embeddings_from_db(full=full, progress=progress)
+            self._update(job_id, state="done", result=result, finished=time.time())
+        except JobCancelled:
+            self._update(job_id, state="cancelled", finished=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, state="failed", error=str(e), finished=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job["finished"] is not None]
+        finished.sort(key=lambda job: job["finished"])
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job["id"]]
+            del self._cancel[job["id"]]
@@ -1,3 +1,63 @@
 document.addEventListener('DOMContentLoaded', function () {
-  // Nothing specific needed yet, can be extended later
+  const form = document.getElementById('reprocess-form');
+  const status = document.getElementById('reprocess-status');
+  const cancel = document.getElementById('reprocess-cancel');
+  const submit = form.querySelector('button[type="submit"]');
+  const POLL_INTERVAL_MS = 1000;
+  let jobId = null;
+
+  function describe(job) {
+    switch (job.state) {
+      case 'queued':
+        return 'Queued...';
+      case 'running':
+        return job.total ? `Embedding ${job.done} / ${job.total}...` : 'Reprocessing...';
+      case 'done':
+        return `${job.result.embedded} embedded, ${job.result.removed} removed, ${job.result.unchanged} unchanged.`;
+      case 'cancelled':
+        return 'Reprocessing cancelled.';
+      default:
+        return `Reprocessing failed: ${job.error}`;
+    }
+  }
+
+  function show(job) {
+    const active = job.state === 'queued' || job.state === 'running';
+    status.textContent = describe(job);
+    submit.disabled = active;
+    cancel.style.display = active ? '' : 'none';
+    return active;
+  }
+
+  async function poll() {
+    try {
+      const res = await fetch(`/reprocess_jobs/${jobId}`);
+      if (res.ok && show(await res.json())) {
+        setTimeout(poll, POLL_INTERVAL_MS);
+      }
+    } catch (err) {
+      status.textContent = 'Lost contact with the server.';
+    }
+  }
+
+  form.addEventListener('submit', async function (e) {
+    e.preventDefault();
+    const res = await fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: { 'Accept': 'application/json' }
+    });
+    const job = await res.json();
+    jobId = job.id;
+    if (show(job)) {
+      setTimeout(poll, POLL_INTERVAL_MS);
+    }
+  });
+
+  cancel.addEventListener('click', async function () {
+    if (jobId) {
+      await fetch(`/reprocess_jobs/${jobId}/cancel`, { method: 'POST' });
+      status.textContent = 'Cancelling...';
+    }
+  });
 });
@@ -1,15 +1,15 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from rag_db import (
     get_all_materials,
-    insert_material,
+    bulk_insert_materials,
     delete_materials_by_ids,
     update_material,
-    create_rag_chunks_table,
-    reprocess_embeddings_from_db
+    create_rag_chunks_table
 )
+from reprocess_jobs import ReprocessJobs
 import csv
 
 app = Flask(__name__)
@@ -18,6 +18,11 @@ UPLOAD_FOLDER = os.path.join(os.getcwd(), 'upload')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+create_rag_chunks_table()
+
+# Re-embedding runs in a background worker; the dashboard polls its progress
+reprocess_jobs = ReprocessJobs()
+
 @app.route('/', methods=['GET'])
 def index():
     materials = get_all_materials()
@@ -36,22 +41,12 @@ def upload():
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
     file.save(filepath)
 
-    added, updated = 0, 0
-    with open(filepath, 'r', encoding='utf-8') as f:
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
         reader = csv.reader(f)
-        header_skipped = False
-        for row in reader:
-            if not header_skipped:
-                header_skipped = True
-                continue
-            if len(row) >= 2:
-                question = row[0].strip()
-                answer = row[1].strip()
-                status = insert_material(question, answer)
-                if status == 'added':
-                    added += 1
-                elif status == 'updated':
-                    updated += 1
+        next(reader, None)  # header
+        added, updated = bulk_insert_materials(
+            (row[0].strip(), row[1].strip()) for row in reader if len(row) >= 2
+        )
 
     flash(f'{added} added, {updated} updated.', 'success')
     return redirect(url_for('index'))
@@ -69,9 +64,26 @@ def delete_selected():
 
 @app.route('/reprocess_chunks', methods=['POST'])
 def reprocess_chunks():
-    reprocess_embeddings_from_db()
-    flash('Reprocessed all embeddings.', 'success')
+    full = request.form.get('full') == 'on'
+    job = reprocess_jobs.submit(full=full)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job), 202
+    flash('Reprocessing started in the background.', 'success')
     return redirect(url_for('index'))
 
+@app.route('/reprocess_jobs/<job_id>', methods=['GET'])
+def reprocess_status(job_id):
+    job = reprocess_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/reprocess_jobs/<job_id>/cancel', methods=['POST'])
+def reprocess_cancel(job_id):
+    job = reprocess_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
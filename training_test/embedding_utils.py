@@ -1,8 +1,9 @@
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import sys
+from pathlib import Path
 
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from embedding import get_encoder
 
 def embed_text(text):
-    vec = model.encode(text)
-    return (vec / np.linalg.norm(vec)).tolist()  # Normalize to unit vector
\ No newline at end of file
+    # Normalized to unit vector; repeated questions come from the shared cache
+    return get_encoder().embed_query(text).tolist()
@@ -1,16 +1,17 @@
+import sys
+from pathlib import Path
 from flask import Flask, render_template, request, jsonify
 from embedding_utils import embed_text
-import psycopg2
 import numpy as np
-from psycopg2.extensions import register_adapter, AsIs
 
-app = Flask(__name__)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ConnectionPool
+from retrieval import answer_from_chunk, register_vector_adapter, search_chunks
 
-def adapt_numpy_array(arr):
-    # Ensures format like '[0.1, 0.2, 0.3]' → valid for pgvector
-    return AsIs("'" + "[" + ",".join([str(x) for x in arr.tolist()]) + "]" + "'")
+app = Flask(__name__)
 
-register_adapter(np.ndarray, adapt_numpy_array)
+# Ensures format like '[0.1,0.2,0.3]' → valid for pgvector
+register_vector_adapter()
 
 # PostgreSQL DB connection
 DB_NAME = 'chatdb'
@@ -18,6 +19,7 @@ DB_USER = 'deepseek'
 DB_PASSWORD = 'Deepseek202502!'
 DB_HOST = 'localhost'
 DB_PORT = '5432'
+db_pool = ConnectionPool(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT)
 
 # Better threshold
 DISTANCE_THRESHOLD = 0.4
@@ -28,27 +30,9 @@ def get_top_chunks_by_query(query, top_n=3):
 
     print("Embedding norm:", np.linalg.norm(normalized))
 
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
-    )
-    cur = conn.cursor()
-
-    # Pass np.ndarray directly
-    cur.execute("""
-        SELECT chunk, embedding <=> %s AS distance
-        FROM rag_chunks
-        ORDER BY distance ASC
-        LIMIT %s
-    """, (normalized, top_n))
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+    with db_pool.cursor() as cur:
+        # Pass np.ndarray directly
+        return search_chunks(cur, normalized, top_n)
 
 @app.route('/')
 def index():
@@ -68,8 +52,7 @@ def ask():
             print(f"Distance: {distance:.4f} | Chunk: {chunk}")
 
         if chunks and chunks[0][1] <= DISTANCE_THRESHOLD:
-            parts = chunks[0][0].split(",", 1)
-            response_text = parts[1].strip() if len(parts) == 2 else parts[0].strip()
+            response_text = answer_from_chunk(chunks[0][0])
         else:
             response_text = "Sorry, I couldn't find a good match for your question."
 
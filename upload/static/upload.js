@@ -31,8 +31,16 @@ async function loadMaterials() {
     });
   
     const result = await res.json();
-    document.getElementById("upload-result").innerText =
-      `Inserted: ${result.inserted}, Updated: ${result.updated}`;
+    const output = document.getElementById("upload-result");
+    if (!res.ok) {
+      output.innerText = `Upload failed: ${result.error}`;
+      fileInput.value = "";
+      return;
+    }
+    output.innerText = `Inserted: ${result.inserted}, Updated: ${result.updated}, Skipped: ${result.skipped}`;
+    result.errors.forEach(err => {
+      output.innerText += `\nLine ${err.line}: ${err.error}`;
+    });
     fileInput.value = "";
     loadMaterials();
   }
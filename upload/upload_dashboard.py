@@ -1,15 +1,19 @@
 import os
+import codecs
 import csv
 import io
-from datetime import datetime
-from fastapi import FastAPI, UploadFile, Request
+import sys
+from itertools import islice
+from fastapi import Body, FastAPI, Request, UploadFile
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-import psycopg2
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db import ConnectionPool, upsert_materials
+
 # Load environment variables
 env_path = Path(__file__).resolve().parent.parent / "configuration" / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -18,24 +22,49 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in .env")
 
-# Connect to PostgreSQL
-conn = psycopg2.connect(DATABASE_URL)
-cursor = conn.cursor()
+# PostgreSQL connection pool; handlers are plain functions run in FastAPI's
+# thread pool, each borrowing its own connection
+db_pool = ConnectionPool(DATABASE_URL)
+
+# Uploads are parsed as they are read and written in batches, so memory
+# stays flat however big the file is; larger files are rejected outright
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", 100)) * 1024 * 1024
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", 5000))
+MAX_REPORTED_ERRORS = 100
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
 
 # Create table if not exists
-cursor.execute("""
-    CREATE TABLE IF NOT EXISTS training_materials (
-        id SERIAL PRIMARY KEY,
-        question TEXT UNIQUE,
-        answer TEXT,
-        updated_at TIMESTAMP
-    )
-""")
-conn.commit()
+with db_pool.cursor() as cursor:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS training_materials (
+            id SERIAL PRIMARY KEY,
+            question TEXT UNIQUE,
+            answer TEXT,
+            updated_at TIMESTAMP
+        )
+    """)
 
 app = FastAPI()
 
-# CORS
+
+def too_large():
+    return JSONResponse(
+        content={"error": f"File is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}, status_code=413
+    )
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Runs before the multipart body is read, so oversized uploads are
+    # refused without being received and spooled to disk first
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            return too_large()
+    return await call_next(request)
+
+# CORS (added last, so it also wraps the 413 above)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -49,56 +78,105 @@ static_dir = Path(__file__).resolve().parent / "static"
 app.mount("/upload/static", StaticFiles(directory=static_dir), name="static")
 
 
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    ready = db_pool.check()
+    return JSONResponse(content={"ready": ready}, status_code=200 if ready else 503)
+
+
 @app.get("/materials")
-async def list_materials():
-    cursor.execute("SELECT id, question, answer, updated_at FROM training_materials ORDER BY updated_at DESC")
-    rows = cursor.fetchall()
+def list_materials():
+    with db_pool.cursor() as cursor:
+        cursor.execute("SELECT id, question, answer, updated_at FROM training_materials ORDER BY updated_at DESC")
+        rows = cursor.fetchall()
     return JSONResponse(content=[
         {"id": row[0], "question": row[1], "answer": row[2], "updated_at": row[3].strftime("%Y-%m-%d %H:%M")}
         for row in rows
     ])
 
 
-@app.post("/upload")
-async def upload_csv(file: UploadFile):
-    contents = await file.read()
-    decoded = contents.decode("utf-8")
-    reader = csv.DictReader(io.StringIO(decoded))
-
-    inserted, updated = 0, 0
+def decode_lines(binary, chunk_size=64 * 1024):
+    """Yield UTF-8 lines, line endings kept, from a binary file read in chunks.
+
+    Works on any file object with read(), unlike io.TextIOWrapper, which
+    needs SpooledTemporaryFile's full io interface (Python 3.11+).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        chunk = binary.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def read_materials(reader, errors):
+    """Yield (question, answer) pairs, recording rows that cannot be used in `errors`."""
     for row in reader:
-        question = row["question"].strip()
-        answer = row["answer"].strip()
-
-        cursor.execute("SELECT answer FROM training_materials WHERE question = %s", (question,))
-        result = cursor.fetchone()
-
-        if result:
-            if result[0] != answer:
-                cursor.execute(
-                    "UPDATE training_materials SET answer = %s, updated_at = %s WHERE question = %s",
-                    (answer, datetime.now(), question)
-                )
-                updated += 1
+        question, answer = row.get("question"), row.get("answer")
+        if question is None or answer is None:
+            error = "missing question or answer"
+        elif not question.strip():
+            error = "empty question"
         else:
-            cursor.execute(
-                "INSERT INTO training_materials (question, answer, updated_at) VALUES (%s, %s, %s)",
-                (question, answer, datetime.now())
-            )
-            inserted += 1
+            yield question.strip(), answer.strip()
+            continue
+        errors.append({"line": reader.line_num, "error": error})
+
 
-    conn.commit()
-    return JSONResponse(content={"inserted": inserted, "updated": updated})
+@app.post("/upload")
+def upload_csv(file: UploadFile):
+    # Requests without a Content-Length get here spooled; check the file itself
+    file.file.seek(0, io.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    if size > MAX_UPLOAD_BYTES:
+        return too_large()
+
+    # Decode and parse incrementally, a few KB at a time
+    reader = csv.DictReader(decode_lines(file.file))
+    errors = []
+    inserted, updated = 0, 0
+    try:
+        if not reader.fieldnames or not {"question", "answer"} <= set(reader.fieldnames):
+            return JSONResponse(content={"error": "The CSV header must contain question and answer columns."}, status_code=400)
+
+        rows = read_materials(reader, errors)
+        with db_pool.cursor() as cursor:
+            while batch := list(islice(rows, UPLOAD_BATCH_SIZE)):
+                batch_inserted, batch_updated = upsert_materials(cursor, batch)
+                inserted += batch_inserted
+                updated += batch_updated
+    except UnicodeDecodeError:
+        return JSONResponse(content={"error": f"The file is not valid UTF-8 (near line {reader.line_num + 1})."}, status_code=400)
+    except csv.Error as e:
+        return JSONResponse(content={"error": f"Line {reader.line_num}: {e}"}, status_code=400)
+
+    return JSONResponse(content={
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    })
 
 
 @app.post("/delete-materials")
-async def delete_materials(request: Request):
-    data = await request.json()
+def delete_materials(data: dict = Body(...)):
     ids = data.get("ids", [])
 
     if ids:
-        cursor.execute("DELETE FROM training_materials WHERE id = ANY(%s)", (ids,))
-        conn.commit()
+        with db_pool.cursor() as cursor:
+            cursor.execute("DELETE FROM training_materials WHERE id = ANY(%s)", (ids,))
 
     return JSONResponse(content={"deleted": ids})
 
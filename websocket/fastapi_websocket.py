@@ -1,30 +1,43 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from pathlib import Path
 import uuid
-import asyncio
+import sys
 import gc
-from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import create_generator
 
-# Load model and tokenizer
-model_name = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(
-    model_name,
-    torch_dtype=torch.float16,
-    device_map=None
-)
-device = torch.device("cpu")
-model.to(device)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model in the background; /readyz reports when it is done
+    await generator.start(wait=False)
+    yield
+    await generator.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Shared model service: loads the model in-process, or talks to
+# `python -m inference.server` when INFERENCE_URL is set
+generator = create_generator()
+PROFILE = "raw"
 
 # Chat history config
 MAX_HISTORY = 3
 chat_histories = {}
 
-# Shared lock to serialize model access
-model_lock = asyncio.Lock()
+# Send tokens to the socket as they are generated instead of one blob
+STREAM_RESPONSES = True
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    status = await generator.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
 
 @app.websocket("/chat")
 async def chat(websocket: WebSocket):
@@ -44,38 +57,35 @@ async def chat(websocket: WebSocket):
 
             context = "\n".join(chat_histories[session_id]) + "\nAssistant:"
 
-            # Serialize model access via lock
-            async with model_lock:
-                response = await run_in_threadpool(generate_response, context)
+            if STREAM_RESPONSES:
+                response = await stream_response(websocket, context, session_id)
+            else:
+                response = await generate_response(context, session_id)
+                for line in response.split("\n"):
+                    if line.strip():
+                        await websocket.send_text(line.strip())
+            await websocket.send_text("[END]")
 
             chat_histories[session_id].append(f"Assistant: {response}")
             print(f"[{session_id}] Assistant: {response}")
 
-            for line in response.split("\n"):
-                if line.strip():
-                    await websocket.send_text(line.strip())
-            await websocket.send_text("[END]")
-
             gc.collect()
 
     except WebSocketDisconnect:
         print(f"[{session_id}] Disconnected")
         chat_histories.pop(session_id, None)
+        await generator.release_session(session_id)
         gc.collect()
 
 
-def generate_response(context: str) -> str:
-    inputs = tokenizer(context, return_tensors="pt").to(device)
-    outputs = model.generate(
-        **inputs,
-        max_new_tokens=256,
-        do_sample=True,
-        pad_token_id=tokenizer.eos_token_id
-    )
-    decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    del inputs, outputs
-    gc.collect()
-
-    if "Assistant:" in decoded:
-        return decoded.split("Assistant:")[-1].strip()
-    return decoded.strip()
+async def generate_response(context: str, session_id: str) -> str:
+    return await generator.generate(context, PROFILE, session_id)
+
+
+async def stream_response(websocket: WebSocket, context: str, session_id: str) -> str:
+    chunks = []
+    async for text in generator.stream(context, PROFILE, session_id):
+        chunks.append(text)
+        await websocket.send_text(text)
+
+    return "".join(chunks).strip()